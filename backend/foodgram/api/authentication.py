@@ -0,0 +1,54 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+
+def token_cache_key(key):
+    """Сам токен в ключ кеша не попадает, только его хеш."""
+    return 'auth:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def forget_tokens(keys):
+    cache.delete_many([token_cache_key(key) for key in keys])
+
+
+def forget_user(user_id):
+    """Сбрасывает закешированную аутентификацию пользователя."""
+    forget_tokens(Token.objects.filter(user_id=user_id).values_list(
+        'key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, который хранит в кеше только id пользователя
+    и is_active для токена, AUTH_TOKEN_CACHE_TIMEOUT секунд. Токен
+    с пользователем не ищется в базе соединением таблиц, пользователь
+    загружается по первичному ключу без хеша пароля.
+
+    Запись удаляется сигналами при удалении токена (выход, удаление
+    пользователя) и при сохранении пользователя (смена пароля,
+    блокировка, правка профиля).
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        cached = cache.get(cache_key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, (user.pk, user.is_active),
+                      settings.AUTH_TOKEN_CACHE_TIMEOUT)
+            return user, token
+        user_id, is_active = cached
+        users = get_user_model().objects.defer('password').filter(
+            pk=user_id, is_active=True)
+        user = is_active and next(iter(users), None)
+        if not user:
+            cache.delete(cache_key)
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return user, self.get_model()(key=key, user=user)
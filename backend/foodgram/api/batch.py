@@ -0,0 +1,50 @@
+from .serializers import BatchIdsSerializer
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+NOT_FOUND = 'not_found'
+SELF = 'self'
+
+
+def get_ids(request):
+    serializer = BatchIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['ids']
+
+
+def add_links(model, user, field, ids, targets):
+    """
+    Связывает пользователя с объектами ids из targets одним
+    bulk_create, уже существующие связи пропускаются.
+    Возвращает {id: результат} и список добавленных id.
+    """
+    column = f'{field}_id'
+    existing = set(model.objects.filter(
+        user=user, **{f'{column}__in': ids}).values_list(column, flat=True))
+    found = set(targets.filter(pk__in=ids).values_list('pk', flat=True))
+    added = [pk for pk in ids if pk in found and pk not in existing]
+    model.objects.bulk_create(
+        [model(user=user, **{column: pk}) for pk in added],
+        ignore_conflicts=True)
+    statuses = dict.fromkeys(existing, EXISTS)
+    statuses.update(dict.fromkeys(added, ADDED))
+    return statuses, added
+
+
+def remove_links(model, user, field, ids):
+    """
+    Удаляет связи пользователя с объектами ids одним DELETE.
+    Возвращает {id: результат} и список удалённых id.
+    """
+    column = f'{field}_id'
+    links = model.objects.filter(user=user, **{f'{column}__in': ids})
+    removed = list(links.select_for_update().values_list(column, flat=True))
+    links.delete()
+    return dict.fromkeys(removed, REMOVED), removed
+
+
+def summary(ids, statuses):
+    """Результат по каждому id в порядке запроса."""
+    return {'results': [{'id': pk, 'status': statuses.get(pk, NOT_FOUND)}
+                        for pk in ids]}
@@ -1,11 +1,34 @@
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
+
 from receipt.models import Receipt, Tag
+from receipt.search import search_recipes
+from receipt.versions import TAGS, get_version
+
+ANY = 'any'
+ALL = 'all'
+
+
+def get_tag_ids():
+    """Словарь {slug: id} тегов, закешированный до их изменения."""
+    return cache.get_or_set(
+        f'tags:slugs:{get_version(TAGS)}',
+        lambda: dict(Tag.objects.values_list('slug', 'id')),
+        None
+    )
+
+
+def tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
 
 
 class ReceiptFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(field_name='tags__slug',
-                                             to_field_name='slug',
-                                             queryset=Tag.objects.all())
+    tags = filters.MultipleChoiceFilter(choices=tag_choices,
+                                        method='tags_filter')
+    tags_mode = filters.ChoiceFilter(choices=((ANY, ANY), (ALL, ALL)),
+                                     method='tags_mode_filter')
+    search = filters.CharFilter(method='search_filter')
     is_favorited = filters.BooleanFilter(
         method='is_favorited_filter')
     is_in_shopping_cart = filters.BooleanFilter(
@@ -15,6 +38,34 @@ class ReceiptFilter(FilterSet):
         model = Receipt
         fields = ('tags', 'author',)
 
+    def tags_filter(self, queryset, name, value):
+        """
+        Рецепты хотя бы с одним из тегов (tags_mode=any, по умолчанию)
+        или со всеми тегами сразу (tags_mode=all). Фильтр строится
+        на подзапросах EXISTS, поэтому рецепты не дублируются
+        и DISTINCT не нужен.
+        """
+        if not value:
+            return queryset
+        tag_ids = get_tag_ids()
+        recipe_tags = Receipt.tags.through.objects.filter(
+            receipt=OuterRef('pk'))
+        if self.form.cleaned_data.get('tags_mode') != ALL:
+            return queryset.filter(Exists(recipe_tags.filter(
+                tag_id__in=[tag_ids[slug] for slug in value])))
+        for slug in value:
+            queryset = queryset.filter(
+                Exists(recipe_tags.filter(tag_id=tag_ids[slug])))
+        return queryset
+
+    def tags_mode_filter(self, queryset, name, value):
+        return queryset
+
+    def search_filter(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
+
     def is_favorited_filter(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
@@ -0,0 +1,158 @@
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from PIL import Image, ImageOps
+
+from receipt.models import Receipt
+from receipt.storage import is_content_name, recipe_images
+
+VARIANTS_DIR = 'posts/variants'
+# Ширина варианта в пикселях, None - исходный размер.
+SIZES = {
+    'card': 480,
+    'detail': 1200,
+    'original': None,
+}
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True,
+                             'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+
+# Увеличить при изменении обработки, не видном в SIZES и FORMATS.
+VARIANTS_VERSION = 1
+# Настройки кодирования входят в имя варианта: при их изменении
+# варианты пишутся под новыми именами, а не поверх старых.
+ENCODING = hashlib.sha256(
+    repr((VARIANTS_VERSION, SIZES, FORMATS)).encode()).hexdigest()[:8]
+
+
+def source_digest(image_name):
+    """
+    Хеш содержимого исходной картинки. У файлов, названных по хешу,
+    он уже есть в имени, старые файлы приходится прочитать.
+    """
+    if is_content_name(image_name):
+        return os.path.splitext(os.path.basename(image_name))[0]
+    digest = hashlib.sha256()
+    with recipe_images.open(image_name, 'rb') as file:
+        for chunk in file.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def variant_name(digest, size, image_format):
+    return (f'{VARIANTS_DIR}/{digest[:2]}/{digest}_{ENCODING}_{size}.'
+            f'{FORMATS[image_format][1]}')
+
+
+def image_urls(image_name, variants, url=None):
+    """
+    Ссылки на варианты картинки {размер: {формат: ссылка}}.
+    Пока варианты для текущей картинки не готовы, все ссылки
+    ведут на исходный файл.
+    """
+    if not image_name:
+        return None
+    url = url or default_storage.url
+    if (variants or {}).get('source') != image_name:
+        original = url(image_name)
+        return {size: {image_format: original for image_format in FORMATS}
+                for size in SIZES}
+    return {size: {image_format: url(name)
+                   for image_format, name in formats.items()}
+            for size, formats in variants['sizes'].items()}
+
+
+def encode(image, image_format):
+    pil_format, _, options = FORMATS[image_format]
+    if image_format == 'jpeg' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A')
+                         if 'A' in image.getbands() else None)
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def describe(image_name, names):
+    return {'source': image_name, 'encoding': ENCODING, 'sizes': names}
+
+
+def is_current(image_name, variants):
+    """Готовы ли варианты этой картинки с текущими настройками."""
+    return (variants.get('source') == image_name
+            and variants.get('encoding') == ENCODING)
+
+
+def make_variants(image_name):
+    """
+    Сохраняет варианты картинки и возвращает их описание. Имя варианта
+    зависит только от содержимого картинки и настроек кодирования,
+    поэтому готовый файл никогда не перезаписывается: ссылка на него
+    может быть закеширована навсегда.
+    """
+    digest = source_digest(image_name)
+    names = {size: {image_format: variant_name(digest, size, image_format)
+                    for image_format in FORMATS}
+             for size in SIZES}
+    missing = {size: [image_format
+                      for image_format, name in formats.items()
+                      if not default_storage.exists(name)]
+               for size, formats in names.items()}
+    if not any(missing.values()):
+        return describe(image_name, names)
+    with recipe_images.open(image_name, 'rb') as file:
+        source = ImageOps.exif_transpose(Image.open(file))
+        source = source.convert(
+            'RGBA' if 'A' in source.getbands() else 'RGB')
+    for size, width in SIZES.items():
+        if not missing[size]:
+            continue
+        image = source
+        if width is not None and source.width > width:
+            image = source.resize(
+                (width, round(source.height * width / source.width)),
+                Image.LANCZOS)
+        for image_format in missing[size]:
+            default_storage.save(names[size][image_format],
+                                 ContentFile(encode(image, image_format)))
+    return describe(image_name, names)
+
+
+def process_recipe_image(recipe_id, image_name):
+    """
+    Готовит варианты картинки рецепта и записывает их в рецепт,
+    если картинку за это время не заменили.
+    """
+    from .recipe_cache import invalidate_recipes
+
+    variants = make_variants(image_name)
+    if Receipt.objects.filter(pk=recipe_id, image=image_name).update(
+            image_variants=variants):
+        invalidate_recipes([recipe_id])
+    return variants
+
+
+def process_in_background(recipe_id, image_name):
+    try:
+        process_recipe_image(recipe_id, image_name)
+    finally:
+        connections.close_all()
+
+
+def schedule_recipe_image(recipe_id, image_name):
+    """
+    При IMAGE_PROCESSING_INLINE картинка обрабатывается сразу в запросе.
+    Иначе веб-воркер ничего не делает: варианты готовит отдельный
+    процесс generate_image_variants --watch, а до тех пор отдаётся
+    исходная картинка.
+    """
+    if settings.IMAGE_PROCESSING_INLINE:
+        process_recipe_image(recipe_id, image_name)
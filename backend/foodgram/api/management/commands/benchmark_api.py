@@ -0,0 +1,194 @@
+import json
+import math
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from receipt.models import Ingredient, Receipt, Tag
+from users.models import User
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class Command(BaseCommand):
+    """
+    Замеряем основные эндпоинты API через тестовый клиент Django
+    """
+    help = ('Прогоняет запросы к основным эндпоинтам и сохраняет '
+            'p50/p95 времени ответа и число SQL-запросов в JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='bench_0@example.com',
+                            help='Email пользователя, от имени которого '
+                                 'идут запросы')
+        parser.add_argument('--iterations', default=50, type=int)
+        parser.add_argument('--warmup', default=5, type=int,
+                            help='Сколько запросов сделать до замеров')
+        parser.add_argument('--search', default='борщ',
+                            help='Строка для сценария поиска рецептов')
+        parser.add_argument('--only', nargs='+', default=None,
+                            help='Запустить только указанные сценарии')
+        parser.add_argument('--output', default=None,
+                            help='Файл для результатов, по умолчанию '
+                                 'benchmark-<время>.json')
+        parser.add_argument('--seed', default=0, type=int,
+                            help='Зерно выборки рецептов: с одним зерном '
+                                 'прогоны запрашивают одни и те же адреса')
+        parser.add_argument('--compare', default=None,
+                            help='JSON предыдущего прогона для сравнения')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations должен быть больше нуля')
+        try:
+            user = User.objects.get(email=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["user"]} не найден, '
+                'сгенерируйте данные командой generate_dataset')
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+        scenarios = self.get_scenarios(user, options['search'],
+                                       options['seed'])
+        if options['only']:
+            unknown = set(options['only']) - scenarios.keys()
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+            scenarios = {name: urls for name, urls in scenarios.items()
+                         if name in options['only']}
+        results = {
+            name: self.run(urls, options['warmup'], options['iterations'])
+            for name, urls in scenarios.items()
+        }
+        report = {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'user': user.email,
+            'iterations': options['iterations'],
+            'seed': options['seed'],
+            'dataset': {
+                'users': User.objects.count(),
+                'recipes': Receipt.objects.count(),
+                'ingredients': Ingredient.objects.count(),
+            },
+            'results': results,
+        }
+        self.print_results(results)
+        output = options['output'] or (
+            f'benchmark-{datetime.now():%Y%m%d-%H%M%S}.json')
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Результаты: {output}'))
+        if options['compare']:
+            self.compare(options['compare'], results, options['seed'])
+
+    def get_scenarios(self, user, search, seed):
+        """
+        Сценарий - список адресов, которые запрашиваются по кругу.
+        Параметры берутся из данных в базе, рецепты для detail
+        выбираются по зерну seed, остальное - первые по id.
+        """
+        slugs = list(Tag.objects.order_by('id').values_list(
+            'slug', flat=True)[:2])
+        tags = urlencode([('tags', slug) for slug in slugs])
+        all_recipe_ids = list(Receipt.objects.order_by('id').values_list(
+            'id', flat=True))
+        recipe_ids = random.Random(seed).sample(
+            all_recipe_ids, min(len(all_recipe_ids), 20))
+        author_ids = list(user.subscriber.order_by('id').values_list(
+            'author_id', flat=True)[:5]) or [user.pk]
+        prefixes = sorted({name[:2] for name in Ingredient.objects.order_by(
+            'id').values_list('name', flat=True)[:20]}) or ['а']
+        if not recipe_ids:
+            raise CommandError('В базе нет рецептов')
+        return {
+            'recipes_list': ['/api/recipes/'],
+            'recipes_list_tags': [f'/api/recipes/?{tags}'],
+            'recipes_list_author': [f'/api/recipes/?author={author_id}'
+                                    for author_id in author_ids],
+            'recipes_list_favorited': ['/api/recipes/?is_favorited=1'],
+            'recipes_search': [
+                f'/api/recipes/?{urlencode({"search": search})}'],
+            'recipe_detail': [f'/api/recipes/{recipe_id}/'
+                              for recipe_id in recipe_ids],
+            'subscriptions': ['/api/users/subscriptions/?recipes_limit=3'],
+            'download_shopping_cart': [
+                '/api/recipes/download_shopping_cart/'],
+            'ingredients_search': [
+                f'/api/ingredients/?{urlencode({"name": prefix})}'
+                for prefix in prefixes],
+        }
+
+    def request(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        return elapsed * 1000, len(queries), response.status_code
+
+    def run(self, urls, warmup, iterations):
+        for number in range(warmup):
+            self.request(urls[number % len(urls)])
+        timings, query_counts, statuses = [], [], {}
+        for number in range(iterations):
+            elapsed, queries, status = self.request(urls[number % len(urls)])
+            timings.append(elapsed)
+            query_counts.append(queries)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        return {
+            'url': urls[0],
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'mean_ms': round(statistics.fmean(timings), 2),
+            'max_ms': round(max(timings), 2),
+            'queries_p50': percentile(query_counts, 50),
+            'queries_max': max(query_counts),
+            'statuses': statuses,
+        }
+
+    def print_results(self, results):
+        self.stdout.write(f'{"сценарий":<26}{"p50, мс":>10}{"p95, мс":>10}'
+                          f'{"запросов":>10}  статусы')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<26}{result["p50_ms"]:>10.2f}{result["p95_ms"]:>10.2f}'
+                f'{result["queries_max"]:>10}  {result["statuses"]}')
+
+    def compare(self, path, results, seed):
+        try:
+            with open(path, encoding='utf-8') as file:
+                report = json.load(file)
+            previous = report['results']
+        except (OSError, ValueError, KeyError):
+            raise CommandError(f'Не удалось прочитать результаты из {path}')
+        self.stdout.write(f'Сравнение с {path}:')
+        if report.get('seed') != seed:
+            self.stdout.write(self.style.WARNING(
+                f'Зерно выборки другое ({report.get("seed")}), '
+                'рецепты в recipe_detail не совпадают'))
+        for name, result in results.items():
+            old = previous.get(name)
+            if old is None:
+                continue
+            change = (result['p95_ms'] - old['p95_ms']) / (
+                old['p95_ms'] or 1e-9) * 100
+            self.stdout.write(
+                f'{name:<26}p95 {old["p95_ms"]:.2f} -> '
+                f'{result["p95_ms"]:.2f} мс ({change:+.0f}%), '
+                f'запросов {old["queries_max"]} -> {result["queries_max"]}')
@@ -0,0 +1,146 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.images import ENCODING, VARIANTS_DIR
+from receipt.models import ImageBlob, Receipt
+from receipt.storage import recipe_images
+
+BATCH_SIZE = 500
+
+
+def walk(storage, directory):
+    """Все файлы каталога с подкаталогами: {имя: дата изменения}."""
+    if not storage.exists(directory):
+        return {}
+    directories, files = storage.listdir(directory)
+    found = {}
+    for name in files:
+        name = posixpath.join(directory, name)
+        found[name] = storage.get_modified_time(name)
+    for name in directories:
+        found.update(walk(storage, posixpath.join(directory, name)))
+    return found
+
+
+def batches(names):
+    names = list(names)
+    for start in range(0, len(names), BATCH_SIZE):
+        yield names[start:start + BATCH_SIZE]
+
+
+def stem(name):
+    return posixpath.splitext(posixpath.basename(name))[0]
+
+
+def referenced_variants():
+    """Имена вариантов, записанные в рецептах."""
+    return {
+        name
+        for variants in Receipt.objects.exclude(image_variants={})
+        .values_list('image_variants', flat=True).iterator()
+        for formats in variants.get('sizes', {}).values()
+        for name in formats.values()
+    }
+
+
+class Command(BaseCommand):
+    """
+    Удаляем картинки, на которые не ссылается ни один рецепт
+    """
+    help = ('Удаляет файлы картинок рецептов без ссылок вместе с их '
+            'вариантами. Файлы моложе --grace-hours не трогает')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', default=24, type=float,
+                            help='Сколько часов хранить файл после '
+                                 'последнего изменения или ссылки')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет удалено')
+
+    def handle(self, *args, **options):
+        if options['grace_hours'] < 0:
+            raise CommandError('--grace-hours не может быть меньше нуля')
+        self.cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        self.dry_run = options['dry_run']
+        images_dir = Receipt._meta.get_field('image').upload_to.rstrip('/')
+        sources = {
+            name: modified
+            for name, modified in walk(recipe_images, images_dir).items()
+            if not name.startswith(f'{VARIANTS_DIR}/')
+        }
+        blobs = {
+            name: (refcount, updated)
+            for name, refcount, updated in ImageBlob.objects.values_list(
+                'name', 'refcount', 'updated')
+        }
+        # Файлы без записи - загрузки, после которых рецепт так и не
+        # сохранился, или рецепты, созданные в обход сигналов.
+        candidates = [
+            name for name, modified in sources.items()
+            if modified < self.cutoff and (
+                name not in blobs
+                or blobs[name][0] <= 0 and blobs[name][1] < self.cutoff)
+        ]
+        referenced = set()
+        for batch in batches(candidates):
+            referenced.update(Receipt.objects.filter(
+                image__in=batch).values_list('image', flat=True))
+        if referenced and not self.dry_run:
+            ImageBlob.objects.recount(sorted(referenced))
+        garbage = set()
+        for batch in batches(
+                name for name in candidates if name not in referenced):
+            garbage.update(self.delete_sources(batch))
+        # Нужны варианты, на которые ссылаются рецепты, и варианты
+        # оставшихся картинок с текущими настройками: их мог только что
+        # взять рецепт, который ещё не успел записать ссылки.
+        kept = {f'{stem(name)}_{ENCODING}'
+                for name in sources if name not in garbage}
+        used = referenced_variants()
+        variants = [
+            name for name, modified in walk(
+                default_storage, VARIANTS_DIR).items()
+            if modified < self.cutoff and name not in used
+            and stem(name).rsplit('_', 1)[0] not in kept
+        ]
+        for name in variants:
+            self.delete(default_storage, name)
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Будет удалено" if self.dry_run else "Удалено"}: '
+            f'картинок {len(garbage)}, вариантов {len(variants)}, '
+            f'ссылок исправлено {len(referenced)}'))
+
+    def delete_sources(self, names):
+        """
+        Удаляет файлы без ссылок. Записи блокируются до конца удаления,
+        а файл, который за это время снова загрузили, остаётся.
+        """
+        with transaction.atomic():
+            acquired = {
+                name for name, refcount in ImageBlob.objects
+                .select_for_update().filter(name__in=names)
+                .values_list('name', 'refcount')
+                if refcount > 0
+            }
+            deleted = [
+                name for name in names
+                if name not in acquired
+                and recipe_images.get_modified_time(name) < self.cutoff
+            ]
+            if not self.dry_run:
+                ImageBlob.objects.filter(
+                    name__in=deleted, refcount__lte=0).delete()
+            for name in deleted:
+                self.delete(recipe_images, name)
+        return deleted
+
+    def delete(self, storage, name):
+        if self.dry_run:
+            self.stdout.write(f'  {name}')
+        else:
+            storage.delete(name)
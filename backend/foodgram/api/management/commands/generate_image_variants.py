@@ -0,0 +1,72 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.images import is_current, process_in_background
+from receipt.models import Receipt
+from receipt.versions import is_shared_cache
+
+
+class Command(BaseCommand):
+    """
+    Готовим варианты картинок для уже загруженных рецептов
+    """
+    help = ('Создаёт уменьшенные копии и WebP/JPEG-варианты картинок '
+            'рецептов, у которых их ещё нет или они сделаны с другими '
+            'настройками. Готовые файлы не перезаписываются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Проверить все рецепты и дописать '
+                                 'недостающие файлы вариантов')
+        parser.add_argument('--workers', default=4, type=int,
+                            help='Сколько картинок обрабатывать параллельно')
+        parser.add_argument('--watch', action='store_true',
+                            help='Не завершаться, а проверять новые '
+                                 'картинки каждые '
+                                 'IMAGE_PROCESSING_INTERVAL секунд')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers должен быть больше нуля')
+        if not options['watch']:
+            self.process(options['force'], options['workers'])
+            return
+        if not is_shared_cache():
+            raise CommandError('Для --watch нужен общий кеш (REDIS_URL), '
+                               'иначе веб-воркеры не узнают о картинках')
+        # Так веб-воркеры не тратят потоки на картинки: загруженные
+        # рецепты дожидаются этого процесса.
+        force = options['force']
+        while True:
+            self.process(force, options['workers'], quiet=True)
+            force = False
+            time.sleep(settings.IMAGE_PROCESSING_INTERVAL)
+
+    def process(self, force, workers, quiet=False):
+        recipes = [
+            (recipe_id, image)
+            for recipe_id, image, variants in Receipt.objects.exclude(
+                image='').values_list('id', 'image', 'image_variants')
+            .iterator()
+            if force or not is_current(image, variants)
+        ]
+        if quiet and not recipes:
+            return
+        self.stdout.write(f'Картинок к обработке: {len(recipes)}')
+        failed = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(process_in_background, recipe_id, image):
+                recipe_id
+                for recipe_id, image in recipes
+            }
+            for future, recipe_id in futures.items():
+                if future.exception() is not None:
+                    failed += 1
+                    self.stderr.write(
+                        f'Рецепт {recipe_id}: {future.exception()}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано: {len(recipes) - failed}, ошибок: {failed}'))
@@ -0,0 +1,85 @@
+import os
+import time
+
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+UNRESOLVED = 'unresolved'
+
+REQUEST_DURATION = Histogram(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса',
+    ('view', 'method'),
+)
+REQUESTS = Counter(
+    'foodgram_requests',
+    'Количество запросов',
+    ('view', 'method', 'status'),
+)
+REQUEST_QUERIES = Histogram(
+    'foodgram_request_queries',
+    'Количество SQL-запросов за один запрос к API',
+    ('view', 'method'),
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100, 200, 500, float('inf')),
+)
+REQUEST_DB_DURATION = Histogram(
+    'foodgram_request_db_seconds',
+    'Суммарное время SQL-запросов за один запрос к API',
+    ('view', 'method'),
+)
+
+
+class QueryCounter:
+    """Обёртка execute_wrapper: считает SQL-запросы и время в базе."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+def view_label(view_func, method):
+    """
+    Имя представления для меток: Класс.действие для вьюсетов DRF,
+    имя класса или функции для остальных представлений.
+    """
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', UNRESOLVED)
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method.lower(), method)}'
+
+
+def observe(view, method, status, duration, counter):
+    REQUEST_DURATION.labels(view, method).observe(duration)
+    REQUESTS.labels(view, method, status).inc()
+    REQUEST_QUERIES.labels(view, method).observe(counter.count)
+    REQUEST_DB_DURATION.labels(view, method).observe(counter.duration)
+
+
+def get_registry():
+    """
+    При запуске под gunicorn с несколькими воркерами метрики каждого
+    процесса пишутся в каталог PROMETHEUS_MULTIPROC_DIR и собираются
+    из него при отдаче.
+    """
+    if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus."""
+    return HttpResponse(generate_latest(get_registry()),
+                        content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,77 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import UNRESOLVED, QueryCounter, observe, view_label
+
+logger = logging.getLogger('foodgram.metrics')
+
+
+class MetricsMiddleware:
+    """
+    Снимает для каждого запроса время ответа, количество SQL-запросов
+    и время в базе, с разбивкой по действиям вьюсетов.
+
+    Запросы медленнее METRICS_SLOW_REQUEST_MS или с числом SQL-запросов
+    больше METRICS_SLOW_QUERY_COUNT дополнительно пишутся в лог
+    одной строкой JSON.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            stack.close()
+            raise
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, stack, request, response,
+                counter, started)
+        else:
+            stack.close()
+            self.finish(request, response, counter, started)
+        return response
+
+    def stream(self, content, stack, request, response, counter, started):
+        """
+        Запросы потокового ответа выполняются уже при его отдаче,
+        поэтому замер заканчивается вместе с последним куском.
+        """
+        try:
+            with stack:
+                yield from content
+        finally:
+            self.finish(request, response, counter, started)
+
+    def finish(self, request, response, counter, started):
+        duration = time.perf_counter() - started
+        view = getattr(request, 'metrics_view', UNRESOLVED)
+        observe(view, request.method, response.status_code, duration,
+                counter)
+        if (duration * 1000 >= settings.METRICS_SLOW_REQUEST_MS
+                or counter.count > settings.METRICS_SLOW_QUERY_COUNT):
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'view': view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 1),
+                'queries': counter.count,
+                'db_ms': round(counter.duration * 1000, 1),
+            }, ensure_ascii=False))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = view_label(view_func, request.method)
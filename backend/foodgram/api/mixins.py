@@ -1,5 +1,44 @@
-from rest_framework import mixins, viewsets
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                quote_etag)
+from rest_framework import mixins, permissions, viewsets
+
+from receipt.versions import get_version
 
 
 class ListSubscriptionViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     """Вазовый класс представления списка подписок."""
+
+
+class ReferenceViewSet(mixins.ListModelMixin,
+                       mixins.RetrieveModelMixin,
+                       viewsets.GenericViewSet):
+    """
+    Базовый класс справочников с условными GET-запросами.
+
+    ETag строится из версии справочника version_name, которую
+    увеличивают сигналы моделей. Если клиент прислал тот же ETag
+    в If-None-Match, ответ 304 отдаётся без обращения к сериализатору.
+    """
+    permission_classes = (permissions.AllowAny, )
+    pagination_class = None
+    version_name = None
+
+    def get_etag(self, request):
+        return quote_etag(
+            f'{self.version_name}-{get_version(self.version_name)}-'
+            f'{request.accepted_renderer.format}')
+
+    def conditional(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
@@ -1,6 +1,217 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class LimitCursorPagination(CursorPagination):
+    """
+    Постраничный вывод по ключу сортировки, без COUNT и OFFSET.
+
+    В отличие от CursorPagination, позиция в курсоре - значения всех
+    полей ordering, а не только первого. Последнее поле уникально,
+    поэтому записи с одинаковым pub_date не требуют смещения и не
+    теряются между страницами: следующая страница выбирается условием
+    (pub_date, id) < (p, i), развёрнутым в
+    pub_date <= p AND (pub_date < p OR pub_date = p AND id < i).
+    """
+
+    page_size_query_param = 'limit'
+    max_page_size = settings.PAGINATION_MAX_LIMIT
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+
+    def _get_position_from_instance(self, instance, ordering):
+        return json.dumps([
+            str(getattr(instance, field.lstrip('-'))) for field in ordering])
+
+    def get_position_filter(self, position, reverse):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(
+                self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        after, equal = Q(), {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+            if not equal:
+                bound = Q(**{f'{name}__{lookup}e': value})
+            after |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return bound & after
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Повторяет CursorPagination.paginate_queryset, кроме условия
+        # на позицию.
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, current_position = 0, False, None
+        else:
+            offset, reverse, current_position = self.cursor
+        if reverse:
+            queryset = queryset.order_by(*(
+                field[1:] if field.startswith('-') else f'-{field}'
+                for field in self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            try:
+                queryset = queryset.filter(
+                    self.get_position_filter(current_position, reverse))
+            except (DjangoValidationError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering)
+        has_current = current_position is not None or offset > 0
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = (
+                has_current, following_position is not None)
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next, self.has_previous = (
+                following_position is not None, has_current)
+            self.next_position = following_position
+            self.previous_position = current_position
+        self.display_page_controls = self.has_previous or self.has_next
+        return self.page
 
 
 class PageLimitPagination(PageNumberPagination):
+    """
+    Постраничный вывод по номеру страницы.
+
+    Если в запросе есть параметр cursor, а у представления задан
+    cursor_ordering, выдача переключается на LimitCursorPagination
+    и ответ приходит без count: {"next", "previous", "results"}.
+    Первая страница запрашивается с пустым курсором: ?cursor=
+    Параметры из cursor_excluded_params представления задают свой
+    порядок выдачи (например, search - по релевантности), курсор
+    его бы молча заменил, поэтому вместе с ними курсор даёт ошибку 400.
+    """
 
     page_size_query_param = 'limit'
+    max_page_size = settings.PAGINATION_MAX_LIMIT
+    cursor_query_param = 'cursor'
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering and self.cursor_query_param in request.query_params:
+            for param in getattr(view, 'cursor_excluded_params', ()):
+                if request.query_params.get(param, '').strip():
+                    raise ValidationError({self.cursor_query_param: (
+                        f'Курсор нельзя сочетать с параметром {param}, '
+                        'используйте номера страниц')})
+            self.cursor_paginator = LimitCursorPagination(ordering)
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class ApproximatePage(Page):
+
+    def __init__(self, object_list, number, paginator, has_next=None):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        if self._has_next is None:
+            return super().has_next()
+        return self._has_next
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator, который не считает COUNT(*) по большим выборкам.
+
+    До PAGINATION_EXACT_COUNT_LIMIT строк количество точное. Выше порога
+    на PostgreSQL берётся оценка планировщика из EXPLAIN, на остальных
+    базах оценки нет и количество всегда точное. Номер страницы при
+    приблизительном количестве не сверяется с num_pages, а наличие
+    следующей страницы определяется по лишней строке в выборке.
+    """
+    count_is_approximate = False
+
+    @cached_property
+    def count(self):
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return self.object_list.count()
+        limit = settings.PAGINATION_EXACT_COUNT_LIMIT
+        bounded = self.object_list[:limit + 1].count()
+        if bounded <= limit:
+            return bounded
+        estimate = self.estimate_count(connection)
+        if estimate is None:
+            return self.object_list.count()
+        self.count_is_approximate = True
+        return max(estimate, bounded)
+
+    def estimate_count(self, connection):
+        sql, params = self.object_list.query.sql_with_params()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                return int(cursor.fetchone()[0][0]['Plan']['Plan Rows'])
+        except DatabaseError:
+            return None
+
+    def validate_number(self, number):
+        if not self.count or not self.count_is_approximate:
+            return super().validate_number(number)
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_approximate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        return ApproximatePage(rows[:self.per_page], number, self,
+                               has_next=len(rows) > self.per_page)
+
+
+class ApproximateCountPagination(PageLimitPagination):
+    """Постраничный вывод с флагом count_is_approximate в ответе."""
+
+    django_paginator_class = ApproximateCountPaginator
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.cursor_paginator is None:
+            response.data['count_is_approximate'] = (
+                self.page.paginator.count_is_approximate)
+        return response
@@ -42,7 +42,7 @@ class IsAuthorOrReadOnly(permissions.BasePermission):
 
         if request.method in ['PATCH', 'DELETE']:
             return (
-                obj.author == request.user
+                obj.author_id == request.user.id
                 or request.user.is_superuser
             )
         return request.method in permissions.SAFE_METHODS
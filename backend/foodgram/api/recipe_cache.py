@@ -0,0 +1,157 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+from receipt.models import Quantity_ingredientes, Receipt
+from receipt.versions import (INGREDIENTS, TAGS, bump_version, get_version,
+                              version_key)
+
+from .images import image_urls
+from .serializers import ReceiptReadSerializer
+
+COOKING_TIME = ReceiptReadSerializer().fields['cooking_time']
+
+
+def recipe_version_name(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def recipe_cache_key(recipe_id, versions):
+    return 'recipe:{}:{}:{}:{}'.format(recipe_id, *versions)
+
+
+def get_versions(names):
+    stored = cache.get_many([version_key(name) for name in names])
+    return [
+        stored[version_key(name)] if version_key(name) in stored
+        else get_version(name)
+        for name in names
+    ]
+
+
+def invalidate_recipes(recipe_ids):
+    """
+    Увеличивает версии рецептов. Старые записи становятся
+    недостижимыми, в том числе та, что параллельный запрос собрал
+    до коммита и положит в кеш уже после этого вызова.
+    """
+    for recipe_id in recipe_ids:
+        bump_version(recipe_version_name(recipe_id))
+
+
+def serialize_recipes(recipe_ids):
+    return ReceiptReadSerializer(
+        Receipt.objects.with_related()
+        .with_user_flags(AnonymousUser())
+        .filter(pk__in=recipe_ids),
+        many=True, context={}).data
+
+
+def build_recipes(recipe_ids):
+    """
+    То же, что serialize_recipes, но без сериализаторов: данные
+    берутся через values() тремя запросами и собираются в словари
+    в порядке полей ReceiptReadSerializer.
+    """
+    tags = defaultdict(list)
+    for recipe_id, *tag in (
+            Receipt.tags.through.objects
+            .filter(receipt_id__in=recipe_ids)
+            .order_by('tag_id')
+            .values_list('receipt_id', 'tag_id', 'tag__name',
+                         'tag__color', 'tag__slug')):
+        tags[recipe_id].append(dict(zip(('id', 'name', 'color', 'slug'),
+                                        tag)))
+    ingredients = defaultdict(list)
+    for recipe_id, *ingredient in (
+            Quantity_ingredientes.objects
+            .filter(recipe_id__in=recipe_ids)
+            .order_by('id')
+            .values_list('recipe_id', 'ingredient_id', 'ingredient__name',
+                         'ingredient__measurement_unit', 'amount')):
+        ingredients[recipe_id].append(dict(zip(
+            ('id', 'name', 'measurement_unit', 'amount'), ingredient)))
+    author_fields = ('email', 'id', 'username', 'first_name', 'last_name')
+    recipes = (
+        Receipt.objects.filter(pk__in=recipe_ids).order_by().values(
+            'id', 'name', 'image', 'image_variants', 'text', 'cooking_time',
+            *(f'author__{field}' for field in author_fields))
+    )
+    return [
+        {
+            'id': recipe['id'],
+            'tags': tags[recipe['id']],
+            'author': {
+                **{field: recipe[f'author__{field}']
+                   for field in author_fields},
+                'is_subscribed': False,
+            },
+            'ingredients': ingredients[recipe['id']],
+            'is_favorited': False,
+            'is_in_shopping_cart': False,
+            'name': recipe['name'],
+            'image': (default_storage.url(recipe['image'])
+                      if recipe['image'] else None),
+            'images': image_urls(recipe['image'], recipe['image_variants']),
+            'text': recipe['text'],
+            'cooking_time': COOKING_TIME.to_representation(
+                recipe['cooking_time']),
+        }
+        for recipe in recipes
+    ]
+
+
+def get_recipe_payloads(recipes, request):
+    """
+    Представления рецептов в формате ReceiptReadSerializer.
+
+    Общая для всех пользователей часть берётся из кеша, недостающие
+    рецепты сериализуются одним запросом с prefetch и кладутся в кеш.
+    Флаги is_favorited, is_in_shopping_cart и author.is_subscribed
+    берутся из аннотаций Receipt.objects.with_user_flags(), ссылка
+    на картинку достраивается до абсолютной по текущему запросу.
+    Версии рецепта и справочников входят в ключ, поэтому правка
+    рецепта сбрасывает его запись, а правка ингредиента или тега -
+    кеш всех рецептов. Рецепты, удалённые после
+    выборки страницы, в результат не попадают.
+    """
+    *versions, ingredients, tags = get_versions([
+        *(recipe_version_name(recipe.pk) for recipe in recipes),
+        INGREDIENTS, TAGS,
+    ])
+    keys = {
+        recipe.pk: recipe_cache_key(recipe.pk,
+                                    (version, ingredients, tags))
+        for recipe, version in zip(recipes, versions)
+    }
+    cached = cache.get_many(keys.values())
+    missing = [pk for pk, key in keys.items() if key not in cached]
+    if missing:
+        build = (build_recipes if settings.RECIPE_FAST_READ
+                 else serialize_recipes)
+        fresh = {keys[item['id']]: item for item in build(missing)}
+        cache.set_many(fresh, settings.RECIPE_CACHE_TIMEOUT)
+        cached.update(fresh)
+    payloads = []
+    for recipe in recipes:
+        if keys[recipe.pk] not in cached:
+            # Рецепт удалили, пока шёл запрос.
+            continue
+        payload = dict(cached[keys[recipe.pk]])
+        payload['author'] = dict(payload['author'],
+                                 is_subscribed=recipe.author_is_subscribed)
+        payload['is_favorited'] = recipe.is_favorited
+        payload['is_in_shopping_cart'] = recipe.is_in_shopping_cart
+        if payload['image']:
+            payload['image'] = request.build_absolute_uri(payload['image'])
+        if payload['images']:
+            payload['images'] = {
+                size: {image_format: request.build_absolute_uri(url)
+                       for image_format, url in formats.items()}
+                for size, formats in payload['images'].items()
+            }
+        payloads.append(payload)
+    return payloads
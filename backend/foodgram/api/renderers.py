@@ -0,0 +1,148 @@
+import csv
+import io
+
+import orjson
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+TITLE = 'Cписок покупок:'
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson. Вывод побайтно совпадает с JSONRenderer
+    при настройках DRF по умолчанию (компактный JSON в UTF-8).
+    Отступы для браузерного API и всё, что orjson не умеет
+    сериализовать, отдаются базовому классу.
+    """
+    encoder = JSONEncoder()
+    options = (orjson.OPT_PASSTHROUGH_DATETIME
+               | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type,
+                                   renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder.default,
+                               option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace(
+            '\u2029'.encode(), b'\\u2029')
+
+
+class Echo:
+    """Псевдо-буфер: csv.writer пишет строку и сразу получает её обратно."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """
+    Базовый класс экспорта списка покупок.
+
+    Строки списка - кортежи (название, количество, единица измерения),
+    метод stream отдаёт готовый файл по частям. Ошибки API отдаются
+    в JSON независимо от выбранного формата.
+    """
+    charset = 'utf-8'
+    extension = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return JSONRenderer().render(data, accepted_media_type,
+                                     renderer_context)
+
+    def get_content_type(self):
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+    def get_filename(self):
+        return f'shop.{self.extension}'
+
+    def stream(self, rows):
+        raise NotImplementedError(
+            'Метод stream() должен быть переопределён.')
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    extension = 'txt'
+
+    def stream(self, rows):
+        yield TITLE
+        for row in rows:
+            yield '\n{} - {} {}.'.format(*row)
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    extension = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('Ингредиент', 'Количество',
+                               'Единица измерения'))
+        for row in rows:
+            yield writer.writerow(row)
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    """
+    PDF собирается целиком и отдаётся одним куском: reportlab
+    не умеет писать документ потоком. Шрифт с кириллицей берётся
+    из настройки SHOPPING_LIST_PDF_FONT.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    extension = 'pdf'
+    charset = None
+    font_name = 'ShoppingListFont'
+    font_size = 12
+
+    def stream(self, rows):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        from reportlab.pdfgen import canvas
+
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_LIST_PDF_FONT))
+        buffer = io.BytesIO()
+        page = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+        margin = 50
+        line_height = self.font_size * 1.5
+        y = height - margin
+        page.setFont(self.font_name, self.font_size + 4)
+        page.drawString(margin, y, TITLE)
+        y -= line_height * 2
+        page.setFont(self.font_name, self.font_size)
+        for row in rows:
+            if y < margin:
+                page.showPage()
+                page.setFont(self.font_name, self.font_size)
+                y = height - margin
+            page.drawString(margin, y, '{} - {} {}.'.format(*row))
+            y -= line_height
+        page.save()
+        yield buffer.getvalue()
+
+
+SHOPPING_LIST_RENDERERS = (
+    TextShoppingListRenderer,
+    CSVShoppingListRenderer,
+    PDFShoppingListRenderer,
+)
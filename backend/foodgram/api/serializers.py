@@ -1,11 +1,18 @@
 from djoser.serializers import (PasswordSerializer, UserCreateSerializer,
                                 UserSerializer, serializers)
 from users.models import User, Subscriptions
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from receipt.models import (Ingredient, Receipt, Tag, Quantity_ingredientes,
-                            Favorite, For_shop)
+                            Favorite, For_shop, ShoppingCartLine)
+from django.core.files.storage import default_storage
 from drf_extra_fields.fields import Base64ImageField
+from rest_framework.exceptions import NotFound
 from rest_framework.validators import UniqueTogetherValidator
 
+from .images import image_urls
+from .uploads import RecipeImageField
+
 
 class CustomUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
@@ -30,12 +37,24 @@ class CustomPasswordSerializer(PasswordSerializer):
     current_password = serializers.CharField(required=True)
 
 
-class ShortRecipeSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+class ImageVariantsMixin(serializers.Serializer):
+    images = serializers.SerializerMethodField()
+
+    def get_images(self, obj):
+        request = self.context.get('request')
+        return image_urls(
+            obj.image.name, obj.image_variants,
+            url=lambda name: (
+                request.build_absolute_uri(default_storage.url(name))
+                if request is not None else default_storage.url(name)))
+
+
+class ShortRecipeSerializer(ImageVariantsMixin, serializers.ModelSerializer):
+    image = serializers.ImageField(read_only=True)
 
     class Meta:
         model = Receipt
-        fields = ('id', 'name', 'image', 'cooking_time',)
+        fields = ('id', 'name', 'image', 'images', 'cooking_time',)
         read_only_fields = ('id', 'name', 'image', 'cooking_time')
 
 
@@ -53,6 +72,8 @@ class UserSubscribeSerializer(CustomUserSerializer):
         return True
 
     def get_recipes(self, obj):
+        if hasattr(obj, 'recipes_preview'):
+            return ShortRecipeSerializer(obj.recipes_preview, many=True).data
         request = self.context.get('request')
         if request is not None:
             limit = request.GET.get('recipes_limit')
@@ -64,6 +85,8 @@ class UserSubscribeSerializer(CustomUserSerializer):
         return ShortRecipeSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
 
@@ -126,7 +149,7 @@ class CustomUserSerializer(UserSerializer):
 
 
 
-class ReceiptReadSerializer(serializers.ModelSerializer):
+class ReceiptReadSerializer(ImageVariantsMixin, serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     ingredients = ReceiptIngredientSerializer(
@@ -140,18 +163,22 @@ class ReceiptReadSerializer(serializers.ModelSerializer):
         fields = ('id', 'tags',
                   'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image',
+                  'name', 'image', 'images',
                   'text', 'cooking_time')
 
     def get_is_favorited(self, obj):
-        if 'favorites' in self.context:
-            return obj.id in self.context.get('favorites')
-        return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        user = self.context['request'].user
+        return (user.is_authenticated
+                and obj.favorite_recipe.filter(user=user).exists())
 
     def get_is_in_shopping_cart(self, obj):
-        if 'shopping_cart' in self.context:
-            return obj.id in self.context.get('shopping_cart')
-        return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        user = self.context['request'].user
+        return (user.is_authenticated
+                and obj.shopping_recipe.filter(user=user).exists())
 
 
 class ReceiptIngredientCreateSerializer(serializers.ModelSerializer):
@@ -168,7 +195,7 @@ class ReceiptCreateSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     id = serializers.ReadOnlyField()
     ingredients = ReceiptIngredientCreateSerializer(many=True)
-    image = Base64ImageField()
+    image = RecipeImageField()
 
     class Meta:
         model = Receipt
@@ -205,24 +232,56 @@ class ReceiptCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Вы уже добавили данный ингрeдиент'
             )
+        unknown = unique_ingredient_id_list - set(
+            Ingredient.objects.in_bulk(unique_ingredient_id_list))
+        if unknown:
+            raise serializers.ValidationError(
+                'Ингредиенты не найдены: '
+                + ', '.join(map(str, sorted(unknown)))
+            )
         return obj
 
-    def tags_and_ingredients_set(self, recipe, tags, ingredients):
-        recipe.tags.set(tags)
+    def ingredients_set(self, recipe, ingredients):
+        """
+        Приводит состав рецепта к ingredients, меняя только
+        отличающиеся строки, и возвращает изменения количеств
+        в виде {ingredient_id: разница} для списков покупок.
+        """
+        current = {row.ingredient_id: row for row in recipe.recipes.all()}
+        old_amounts = {ingredient_id: row.amount
+                       for ingredient_id, row in current.items()}
+        amounts = {item['id']: item['amount'] for item in ingredients}
+        changed = []
+        for ingredient_id, amount in amounts.items():
+            row = current.get(ingredient_id)
+            if row is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        Quantity_ingredientes.objects.bulk_update(changed, ['amount'])
         Quantity_ingredientes.objects.bulk_create(
-            [Quantity_ingredientes(
-                recipe=recipe,
-                ingredient=Ingredient.objects.get(pk=ingredient['id']),
-                amount=ingredient['amount']
-            ) for ingredient in ingredients]
+            [Quantity_ingredientes(recipe=recipe,
+                                   ingredient_id=ingredient_id,
+                                   amount=amount)
+             for ingredient_id, amount in amounts.items()
+             if ingredient_id not in current]
         )
+        removed = current.keys() - amounts.keys()
+        if removed:
+            recipe.recipes.filter(ingredient_id__in=removed).delete()
+        return {
+            ingredient_id: (amounts.get(ingredient_id, 0)
+                            - old_amounts.get(ingredient_id, 0))
+            for ingredient_id in amounts.keys() | old_amounts.keys()
+        }
 
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        recipe = Receipt.objects.create(author=self.context['request'].user,
-                                        **validated_data)
-        self.tags_and_ingredients_set(recipe, tags, ingredients)
+        with transaction.atomic():
+            recipe = Receipt.objects.create(
+                author=self.context['request'].user, **validated_data)
+            recipe.tags.set(tags)
+            self.ingredients_set(recipe, ingredients)
         return recipe
 
     def update(self, instance, validated_data):
@@ -233,14 +292,17 @@ class ReceiptCreateSerializer(serializers.ModelSerializer):
             'cooking_time', instance.cooking_time)
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        Quantity_ingredientes.objects.filter(
-            recipe=instance,
-            ingredient__in=instance.ingredients.all()).delete()
-        self.tags_and_ingredients_set(instance, tags, ingredients)
-        instance.save()
+        with transaction.atomic():
+            instance.tags.set(tags)
+            deltas = self.ingredients_set(instance, ingredients)
+            instance.save()
+            ShoppingCartLine.objects.change_recipe(instance, deltas)
         return instance
 
     def to_representation(self, instance):
+        instance = (Receipt.objects.with_related()
+                    .with_user_flags(self.context['request'].user)
+                    .get(pk=instance.pk))
         return ReceiptReadSerializer(instance,
                                      context=self.context).data
 
@@ -265,15 +327,15 @@ class FavoriteSerializer(serializers.ModelSerializer):
     def create(self, obj):
         user = self.context['request'].user
         recipe = self.context.get('recipe')
-        if Favorite.objects.filter(
-            user=user,
-            recipe=recipe,
-        ).exists():
+        try:
+            added = Favorite.objects.add(user, recipe)
+        except IntegrityError:
+            raise NotFound('Рецепт удалён')
+        if not added:
             raise serializers.ValidationError(
                 {'error': 'Рецепт уже в избранном'},
             )
-
-        return Favorite.objects.create(user=user, recipe=recipe)
+        return Favorite(user=user, recipe=recipe)
 
 
 class ForShopSerializer(serializers.ModelSerializer):
@@ -296,12 +358,29 @@ class ForShopSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         user = self.context['request'].user
         recipe = self.context.get('recipe')
-        if For_shop.objects.filter(
-            user=user,
-            recipe=recipe,
-        ).exists():
+        try:
+            with transaction.atomic():
+                added = For_shop.objects.add(user, recipe)
+                if added:
+                    ShoppingCartLine.objects.add_recipe(user, recipe)
+        except IntegrityError:
+            # Рецепт удалили до коммита, внешний ключ не сошёлся.
+            raise NotFound('Рецепт удалён')
+        if not added:
             raise serializers.ValidationError(
                 {'error': 'Рецепт уже в избранном'},
             )
+        return For_shop(user=user, recipe=recipe)
+
 
-        return For_shop.objects.create(user=user, recipe=recipe)
+class BatchIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+    )
+
+    def validate_ids(self, ids):
+        if len(ids) > settings.BATCH_MAX_IDS:
+            raise serializers.ValidationError(
+                f'Не больше {settings.BATCH_MAX_IDS} id за запрос')
+        return list(dict.fromkeys(ids))
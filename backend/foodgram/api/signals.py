@@ -0,0 +1,70 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from receipt.models import Quantity_ingredientes, Receipt
+from users.models import User
+
+from .authentication import forget_tokens, forget_user
+from .images import schedule_recipe_image
+from .recipe_cache import invalidate_recipes
+
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+def invalidate_on_commit(recipe_ids):
+    transaction.on_commit(lambda: invalidate_recipes(recipe_ids))
+
+
+@receiver((post_save, post_delete), sender=Receipt)
+def recipe_changed(instance, **kwargs):
+    invalidate_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Receipt)
+def recipe_image_changed(instance, **kwargs):
+    image_name = instance.image.name
+    if image_name and instance.image_variants.get('source') != image_name:
+        transaction.on_commit(
+            lambda: schedule_recipe_image(instance.pk, image_name))
+
+
+@receiver(m2m_changed, sender=Receipt.tags.through)
+def recipe_tags_changed(instance, action, **kwargs):
+    if action.startswith('post_') and isinstance(instance, Receipt):
+        invalidate_on_commit([instance.pk])
+
+
+@receiver((post_save, post_delete), sender=Quantity_ingredientes)
+def recipe_ingredients_changed(instance, **kwargs):
+    invalidate_on_commit([instance.recipe_id])
+
+
+@receiver(post_save, sender=User)
+def author_changed(instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None
+                   and not AUTHOR_FIELDS.intersection(update_fields)):
+        return
+    invalidate_on_commit(
+        list(instance.recipes.values_list('pk', flat=True)))
+
+
+def forget_now_and_on_commit(forget):
+    """
+    Запись сбрасывается сразу и ещё раз после коммита: параллельный
+    запрос мог успеть закешировать старые данные до фиксации транзакции.
+    """
+    forget()
+    transaction.on_commit(forget)
+
+
+@receiver(post_save, sender=User)
+def user_changed(instance, created, **kwargs):
+    if not created:
+        forget_now_and_on_commit(lambda: forget_user(instance.pk))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(instance, **kwargs):
+    forget_now_and_on_commit(lambda: forget_tokens([instance.key]))
@@ -0,0 +1,93 @@
+import base64
+import io
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from receipt.models import Ingredient, Quantity_ingredientes, Receipt, Tag
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='foodgram-tests-')
+
+
+def png(color='red', size=(8, 6)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def image_base64(color='red'):
+    return 'data:image/png;base64,' + base64.b64encode(png(color)).decode()
+
+
+test_settings = override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    IMAGE_PROCESSING_INLINE=True,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+
+
+class FoodgramTestMixin:
+    """Тесты с картинками во временном каталоге и пустым кешем."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    @staticmethod
+    def make_user(number=0, **kwargs):
+        return User.objects.create_user(
+            email=f'user{number}@example.com', username=f'user{number}',
+            password='secret-password', first_name='Имя',
+            last_name=f'Фамилия {number}', **kwargs)
+
+    @staticmethod
+    def make_tag(number=0):
+        return Tag.objects.create(name=f'Тег {number}', slug=f'tag-{number}',
+                                  color=f'#00000{number % 10}')
+
+    @staticmethod
+    def make_ingredient(number=0):
+        return Ingredient.objects.create(name=f'Ингредиент {number}',
+                                         measurement_unit='г')
+
+    @staticmethod
+    def make_recipe(author, name='Рецепт', text='Описание', tags=(),
+                    ingredients=()):
+        """Рецепт с ингредиентами в виде пар (ингредиент, количество)."""
+        recipe = Receipt(author=author, name=name, text=text,
+                         cooking_time=10)
+        recipe.image.save('recipe.png', ContentFile(png()), save=False)
+        recipe.save()
+        recipe.tags.set(tags)
+        for ingredient, amount in ingredients:
+            Quantity_ingredientes.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=amount)
+        return recipe
+
+    @staticmethod
+    def client_for(user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+
+
+@test_settings
+class FoodgramTestCase(FoodgramTestMixin, TestCase):
+    pass
+
+
+@test_settings
+class FoodgramTransactionTestCase(FoodgramTestMixin, TransactionTestCase):
+    """Для проверок, которым нужны настоящие коммиты."""
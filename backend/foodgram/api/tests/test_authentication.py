@@ -0,0 +1,52 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache_key
+
+from .base import FoodgramTestCase
+
+
+class CachedTokenAuthenticationTests(FoodgramTestCase):
+    """В кеше токена нет хеша пароля, смена пароля и блокировка работают."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.user.set_password('old-password-1')
+        self.user.save()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def me(self):
+        return self.client.get('/api/users/me/')
+
+    def test_cache_holds_no_password(self):
+        self.assertEqual(self.me().status_code, 200)
+        self.assertEqual(cache.get(token_cache_key(self.token.key)),
+                         (self.user.id, True))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.me()
+        self.assertEqual(response.json()['id'], self.user.id)
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('authtoken_token', sql)
+        self.assertNotIn('password', sql)
+
+    def test_set_password_with_cached_token(self):
+        self.assertEqual(self.me().status_code, 200)
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': 'old-password-1',
+            'new_password': 'new-password-2',
+        })
+        self.assertEqual(response.status_code, 204, response.content)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('new-password-2'))
+
+    def test_blocked_user(self):
+        self.assertEqual(self.me().status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.me().status_code, 401)
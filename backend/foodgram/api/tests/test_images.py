@@ -0,0 +1,60 @@
+import os
+from io import StringIO
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+from api import images
+
+from .base import FoodgramTestCase
+
+
+class ImageVariantsTests(FoodgramTestCase):
+    """Файл варианта по однажды выданной ссылке не меняется."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.make_recipe(self.make_user())
+
+    def generate(self):
+        # Так картинку обрабатывают и запрос при IMAGE_PROCESSING_INLINE,
+        # и generate_image_variants, в том числе с --watch и --force.
+        variants = images.process_recipe_image(self.recipe.id,
+                                               self.recipe.image.name)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, variants)
+        return variants
+
+    def files(self, variants):
+        return {
+            name: os.stat(default_storage.path(name)).st_mtime_ns
+            for formats in variants['sizes'].values()
+            for name in formats.values()
+        }
+
+    def test_regeneration_keeps_existing_files(self):
+        variants = self.generate()
+        self.assertTrue(images.is_current(self.recipe.image.name, variants))
+        files = self.files(variants)
+        self.assertTrue(all(images.ENCODING in name for name in files))
+        self.assertEqual(self.generate(), variants)
+        self.assertEqual(self.files(variants), files)
+
+    def test_new_settings_write_new_names(self):
+        old = self.generate()
+        old_files = self.files(old)
+        encoding = mock.patch.object(images, 'ENCODING', 'changed')
+        collector_encoding = mock.patch(
+            'api.management.commands.collect_image_garbage.ENCODING',
+            'changed')
+        with encoding, collector_encoding:
+            self.assertFalse(images.is_current(self.recipe.image.name, old))
+            new = self.generate()
+            self.assertTrue(set(self.files(new)).isdisjoint(old_files))
+            self.assertEqual(self.files(old), old_files)
+            call_command('collect_image_garbage', grace_hours=0,
+                         stdout=StringIO())
+        for name in old_files:
+            self.assertFalse(default_storage.exists(name))
+        self.files(new)
@@ -0,0 +1,76 @@
+from django.db import connection
+
+from receipt.models import Favorite, For_shop, Receipt
+from users.models import Subscriptions, User
+
+from .base import FoodgramTestCase
+
+# Модель и столбцы составного уникального индекса, начинающегося с user_id.
+COMPOSITE_INDEXES = (
+    (Favorite, ['user_id', 'recipe_id']),
+    (For_shop, ['user_id', 'recipe_id']),
+    (Subscriptions, ['user_id', 'author_id']),
+)
+
+
+def index_names(model, columns):
+    """
+    Имена индексов по столбцам columns в том виде, в каком их
+    показывает EXPLAIN. SQLite строит индекс ограничения UNIQUE
+    из CREATE TABLE сам и называет его sqlite_autoindex_*.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        names = {
+            name for name, info in connection.introspection.get_constraints(
+                cursor, table).items()
+            if info['columns'] == columns and (info['unique']
+                                               or info['index'])
+        }
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'PRAGMA index_list("{table}")')
+            for name in [row[1] for row in cursor.fetchall()]:
+                cursor.execute(f'PRAGMA index_info("{name}")')
+                if [row[2] for row in sorted(cursor.fetchall())] == columns:
+                    names.add(name)
+    return names
+
+
+class CompositeIndexTests(FoodgramTestCase):
+    """Флаги и фильтры по пользователю идут по составным индексам."""
+
+    def setUp(self):
+        super().setUp()
+        if connection.vendor == 'postgresql':
+            # На пустых таблицах планировщик предпочёл бы Seq Scan.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        self.user = self.make_user()
+
+    def assert_uses_index(self, queryset, model, columns):
+        names = index_names(model, columns)
+        self.assertTrue(names)
+        plan = queryset.explain()
+        self.assertTrue(any(name in plan for name in names),
+                        f'{sorted(names)} не найден в плане:\n{plan}')
+
+    def test_user_flags(self):
+        queryset = Receipt.objects.with_user_flags(self.user)
+        for model, columns in COMPOSITE_INDEXES:
+            with self.subTest(model=model.__name__):
+                self.assert_uses_index(queryset, model, columns)
+
+    def test_user_filters(self):
+        querysets = (
+            Receipt.objects.filter(favorite_recipe__user=self.user),
+            Receipt.objects.filter(shopping_recipe__user=self.user),
+            User.objects.filter(subscription__user=self.user),
+        )
+        for queryset, (model, columns) in zip(querysets, COMPOSITE_INDEXES):
+            with self.subTest(model=model.__name__):
+                self.assert_uses_index(queryset, model, columns)
+
+    def test_no_separate_user_index(self):
+        for model, _ in COMPOSITE_INDEXES:
+            with self.subTest(model=model.__name__):
+                self.assertFalse(index_names(model, ['user_id']))
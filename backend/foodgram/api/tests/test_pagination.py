@@ -0,0 +1,64 @@
+from base64 import b64encode
+from urllib.parse import urlsplit
+
+from django.test import override_settings
+
+from receipt.models import Receipt
+
+from .base import FoodgramTestCase
+
+
+class RecipeCursorTests(FoodgramTestCase):
+    """Курсор не теряет и не повторяет рецепты с одинаковым pub_date."""
+
+    def setUp(self):
+        super().setUp()
+        author = self.make_user()
+        self.ids = [self.make_recipe(author, name=f'Рецепт {number}').id
+                    for number in range(5)]
+        Receipt.objects.update(pub_date=Receipt.objects.first().pub_date)
+        self.client = self.client_for()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        return [item['id'] for item in data['results']], data
+
+    def path(self, link):
+        url = urlsplit(link)
+        return f'{url.path}?{url.query}'
+
+    def test_walk_forward_and_back(self):
+        pages = []
+        ids, data = self.get('/api/recipes/?cursor=&limit=2')
+        pages.append(ids)
+        while data['next']:
+            ids, data = self.get(self.path(data['next']))
+            pages.append(ids)
+        self.assertEqual(sum(pages, []), sorted(self.ids, reverse=True))
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        while data['previous']:
+            ids, data = self.get(self.path(data['previous']))
+            self.assertEqual(ids, pages[-2])
+            pages.pop()
+        self.assertEqual(len(pages), 1)
+
+    def test_invalid_cursor(self):
+        cursor = b64encode(b'p=not-a-position').decode()
+        response = self.client.get(f'/api/recipes/?cursor={cursor}')
+        self.assertEqual(response.status_code, 404)
+
+
+class RecipeCountTests(FoodgramTestCase):
+    """Без оценки планировщика count точный и сразу видит новые рецепты."""
+
+    @override_settings(PAGINATION_EXACT_COUNT_LIMIT=2)
+    def test_exact_count_without_postgresql(self):
+        author = self.make_user()
+        client = self.client_for()
+        for expected in range(1, 5):
+            self.make_recipe(author, name=f'Рецепт {expected}')
+            data = client.get('/api/recipes/?limit=1').json()
+            self.assertEqual(data['count'], expected)
+            self.assertFalse(data['count_is_approximate'])
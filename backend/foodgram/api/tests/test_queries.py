@@ -0,0 +1,40 @@
+from django.core.cache import cache
+
+from .base import FoodgramTestCase
+
+# COUNT, страница рецептов, рецепты с автором, теги, ингредиенты.
+COLD_QUERIES = 5
+# COUNT и страница рецептов, остальное берётся из кеша.
+WARM_QUERIES = 2
+
+
+class RecipeListQueriesTests(FoodgramTestCase):
+    """Число запросов ленты рецептов не зависит от размера страницы."""
+
+    def setUp(self):
+        super().setUp()
+        author = self.make_user(0)
+        ingredients = [self.make_ingredient(number) for number in range(3)]
+        tags = [self.make_tag(number) for number in range(2)]
+        for number in range(12):
+            self.make_recipe(
+                author, name=f'Рецепт {number}', tags=tags,
+                ingredients=[(ingredient, number + 1)
+                             for ingredient in ingredients])
+        self.reader = self.make_user(1)
+
+    def assert_list_queries(self, client):
+        for limit in (2, 6, 12):
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(COLD_QUERIES):
+                    response = client.get(f'/api/recipes/?limit={limit}')
+                self.assertEqual(len(response.json()['results']), limit)
+                with self.assertNumQueries(WARM_QUERIES):
+                    client.get(f'/api/recipes/?limit={limit}')
+
+    def test_anonymous(self):
+        self.assert_list_queries(self.client_for())
+
+    def test_authenticated(self):
+        self.assert_list_queries(self.client_for(self.reader))
@@ -0,0 +1,51 @@
+from unittest import mock
+
+from django.test import RequestFactory, override_settings
+
+from api import recipe_cache
+from api.recipe_cache import get_recipe_payloads
+from receipt.models import Receipt
+
+from .base import FoodgramTestCase
+
+
+class RecipePayloadsTests(FoodgramTestCase):
+    """Кеш рецептов не отдаёт устаревшие и удалённые рецепты."""
+
+    def test_recipe_deleted_after_page_query(self):
+        author = self.make_user()
+        request = RequestFactory().get('/api/recipes/')
+        for fast_read in (False, True):
+            with self.subTest(fast_read=fast_read), override_settings(
+                    RECIPE_FAST_READ=fast_read):
+                kept = self.make_recipe(author, name='Оставленный')
+                deleted = self.make_recipe(author, name='Удалённый')
+                page = list(Receipt.objects.with_user_flags(author).filter(
+                    pk__in=[kept.pk, deleted.pk]).order_by('id'))
+                deleted.delete()
+                payloads = get_recipe_payloads(page, request)
+                self.assertEqual([payload['id'] for payload in payloads],
+                                 [kept.id])
+
+    def test_stale_payload_stored_after_invalidation(self):
+        author = self.make_user()
+        recipe_id = self.make_recipe(author, name='Старое').pk
+        page = Receipt.objects.with_user_flags(author).filter(pk=recipe_id)
+        request = RequestFactory().get('/api/recipes/')
+        build_recipes = recipe_cache.build_recipes
+
+        def build_then_commit(recipe_ids):
+            # Собрали рецепт, а параллельная правка успела закоммититься
+            # и сбросить кеш раньше, чем результат попал в кеш.
+            try:
+                return build_recipes(recipe_ids)
+            finally:
+                Receipt.objects.filter(pk=recipe_id).update(name='Новое')
+                recipe_cache.invalidate_recipes([recipe_id])
+
+        with mock.patch.object(recipe_cache, 'build_recipes',
+                               build_then_commit):
+            payloads = get_recipe_payloads(list(page), request)
+        self.assertEqual(payloads[0]['name'], 'Старое')
+        payloads = get_recipe_payloads(list(page), request)
+        self.assertEqual(payloads[0]['name'], 'Новое')
@@ -0,0 +1,69 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
+
+from api.renderers import ORJSONRenderer
+
+from .base import FoodgramTestCase
+
+NAMES = (
+    'Пирог "бабушкин" с \'яблоками\'',
+    'Строка\nперенос\tтаб и \\ слеш',
+    'Суп 🍲 с эмодзи',
+    'Разделители\u2028строк\u2029и абзацев',
+)
+
+
+class RendererParityTests(FoodgramTestCase):
+    """
+    Ответы побайтно совпадают при любом сочетании RECIPE_FAST_READ
+    и рендерера: orjson и ручная сборка рецептов ничего не меняют.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.make_user(0)
+        ingredient = self.make_ingredient(1)
+        tag = self.make_tag(1)
+        self.recipes = [
+            self.make_recipe(self.author, name=name, text=name, tags=[tag],
+                             ingredients=[(ingredient, number + 1)])
+            for number, name in enumerate(NAMES)
+        ]
+        self.client = self.client_for(self.author)
+
+    def responses(self):
+        recipe_id = self.recipes[-1].id
+        return [
+            self.client.get('/api/recipes/'),
+            self.client.get('/api/recipes/?limit=2&page=2'),
+            self.client.get(f'/api/recipes/{recipe_id}/'),
+            self.client.get('/api/recipes/999999/'),
+            self.client.post('/api/recipes/', {'name': NAMES[2]},
+                             format='json'),
+        ]
+
+    def render_all(self, fast_read, renderer):
+        cache.clear()
+        renderers = mock.patch.object(APIView, 'renderer_classes',
+                                      [renderer])
+        with override_settings(RECIPE_FAST_READ=fast_read), renderers:
+            return [(response.status_code, response.content)
+                    for response in self.responses()]
+
+    def test_byte_parity(self):
+        expected = self.render_all(False, JSONRenderer)
+        self.assertEqual([status for status, _ in expected],
+                         [200, 200, 200, 404, 400])
+        self.assertIn(b'\\u2028', expected[2][1])
+        self.assertIn(b'\\u2029', expected[2][1])
+        self.assertIn('🍲'.encode(), expected[0][1])
+        for fast_read in (False, True):
+            for renderer in (JSONRenderer, ORJSONRenderer):
+                with self.subTest(fast_read=fast_read,
+                                  renderer=renderer.__name__):
+                    self.assertEqual(self.render_all(fast_read, renderer),
+                                     expected)
@@ -0,0 +1,73 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .base import FoodgramTestCase, image_base64
+
+
+class RecipeSearchTests(FoodgramTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client = self.client_for(self.user)
+        self.tag = self.make_tag()
+        self.ingredient = self.make_ingredient()
+
+    def search(self, text):
+        response = self.client.get('/api/recipes/', {'search': text})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_created_recipe_is_found(self):
+        response = self.client.post('/api/recipes/', {
+            'name': 'Борщ украинский',
+            'text': 'Свёкла, капуста и картофель',
+            'cooking_time': 90,
+            'image': image_base64(),
+            'tags': [self.tag.id],
+            'ingredients': [{'id': self.ingredient.id, 'amount': 100}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        recipe_id = response.json()['id']
+
+        self.assertEqual(self.search('борщ'), [recipe_id])
+        self.assertEqual(self.search('капуста'), [recipe_id])
+        self.assertEqual(self.search('пирог'), [])
+
+    def test_edited_and_deleted_recipes(self):
+        recipe = self.make_recipe(self.user, name='Салат',
+                                  text='Огурцы и помидоры')
+        other = self.make_recipe(self.user, name='Рагу', text='Салат внутри')
+        self.assertEqual(self.search('салат'), [recipe.id, other.id])
+
+        recipe.name = 'Окрошка'
+        recipe.text = 'Квас'
+        recipe.save()
+        self.assertEqual(self.search('салат'), [other.id])
+        self.assertEqual(self.search('окрошка'), [recipe.id])
+
+        other.delete()
+        self.assertEqual(self.search('салат'), [])
+
+    def test_search_with_cursor(self):
+        recipe = self.make_recipe(self.user, name='Борщ')
+        response = self.client.get('/api/recipes/',
+                                   {'search': 'борщ', 'cursor': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json())
+        response = self.client.get('/api/recipes/',
+                                   {'search': ' ', 'cursor': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['id'] for item in response.json()['results']],
+            [recipe.id])
+
+    def test_search_vector_is_not_loaded(self):
+        recipe = self.make_recipe(self.user, name='Борщ')
+        for url in ('/api/recipes/', f'/api/recipes/{recipe.id}/'):
+            with self.subTest(url=url), CaptureQueriesContext(
+                    connection) as queries:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+            self.assertFalse(any('search_vector' in query['sql']
+                                 for query in queries))
@@ -0,0 +1,194 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+
+from api.views import ReceiptViewSet
+from receipt.models import (For_shop, Quantity_ingredientes, Receipt,
+                            ShoppingCartLine, ShoppingCartLineQuerySet)
+
+from .base import FoodgramTestCase, FoodgramTransactionTestCase
+
+
+class ShoppingCartTotalsTests(FoodgramTestCase):
+    """Итоги списков покупок сходятся с корзинами при любых изменениях."""
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.make_user(0)
+        self.buyer = self.make_user(1)
+        self.flour, self.milk, self.eggs = (
+            self.make_ingredient(number) for number in range(3))
+        self.pancakes = self.make_recipe(
+            self.author, name='Блины',
+            ingredients=[(self.flour, 200), (self.milk, 500)])
+        self.omelette = self.make_recipe(
+            self.author, name='Омлет',
+            ingredients=[(self.milk, 100), (self.eggs, 3)])
+        self.client = self.client_for(self.buyer)
+        for recipe in (self.pancakes, self.omelette):
+            response = self.client.post(
+                f'/api/recipes/{recipe.id}/shopping_cart/')
+            self.assertEqual(response.status_code, 201)
+
+    def totals(self, user):
+        return dict(ShoppingCartLine.objects.filter(user=user).values_list(
+            'ingredient_id', 'total_amount'))
+
+    def assert_totals_consistent(self):
+        call_command('rebuild_shopping_cart', verify=True, stdout=StringIO())
+
+    def test_add_and_remove_through_api(self):
+        self.assertEqual(self.totals(self.buyer), {
+            self.flour.id: 200, self.milk.id: 600, self.eggs.id: 3})
+        response = self.client.delete(
+            f'/api/recipes/{self.pancakes.id}/shopping_cart/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.totals(self.buyer),
+                         {self.milk.id: 100, self.eggs.id: 3})
+        self.assert_totals_consistent()
+
+    def test_add_twice(self):
+        response = self.client.post(
+            f'/api/recipes/{self.pancakes.id}/shopping_cart/')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(For_shop.objects.add(self.buyer, self.pancakes))
+        self.assertEqual(self.totals(self.buyer), {
+            self.flour.id: 200, self.milk.id: 600, self.eggs.id: 3})
+        self.assert_totals_consistent()
+
+    def test_add_and_remove_are_single_statements(self):
+        with self.assertNumQueries(1):
+            self.assertFalse(For_shop.objects.add(self.buyer, self.pancakes))
+        with self.assertNumQueries(1):
+            self.assertTrue(
+                For_shop.objects.remove(self.buyer, self.pancakes.id))
+        with self.assertNumQueries(1):
+            self.assertFalse(
+                For_shop.objects.remove(self.buyer, self.pancakes.id))
+
+    def test_delete_buyer(self):
+        self.buyer.delete()
+        self.assertFalse(ShoppingCartLine.objects.exists())
+        self.assert_totals_consistent()
+
+    def test_rebuild_for_users(self):
+        other = self.make_user(2)
+        For_shop.objects.create(user=other, recipe=self.omelette)
+        Quantity_ingredientes.objects.filter(ingredient=self.milk).update(
+            amount=1)
+        ShoppingCartLine.objects.rebuild([self.buyer])
+        self.assertEqual(self.totals(self.buyer), {
+            self.flour.id: 200, self.milk.id: 2, self.eggs.id: 3})
+        self.assertEqual(self.totals(other), {})
+        ShoppingCartLine.objects.rebuild()
+        self.assert_totals_consistent()
+
+    def admin_client(self):
+        admin = self.make_user(9, is_staff=True, is_superuser=True)
+        client = self.client_for()
+        client.force_login(admin)
+        return client
+
+    def test_delete_recipe_in_admin(self):
+        response = self.admin_client().post(
+            f'/admin/receipt/receipt/{self.pancakes.id}/delete/',
+            {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.totals(self.buyer),
+                         {self.milk.id: 100, self.eggs.id: 3})
+        self.assert_totals_consistent()
+
+    def test_delete_author_in_admin(self):
+        response = self.admin_client().post(
+            '/admin/users/user/', {
+                'action': 'delete_selected', 'post': 'yes',
+                '_selected_action': [self.author.id],
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.totals(self.buyer), {})
+        self.assert_totals_consistent()
+
+    def test_edit_cart_and_amounts_in_admin(self):
+        client = self.admin_client()
+        row = Quantity_ingredientes.objects.get(
+            recipe=self.pancakes, ingredient=self.flour)
+        response = client.post(
+            f'/admin/receipt/quantity_ingredientes/{row.id}/change/', {
+                'recipe': self.pancakes.id, 'ingredient': self.eggs.id,
+                'amount': 2,
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.totals(self.buyer),
+                         {self.milk.id: 600, self.eggs.id: 5})
+        cart = For_shop.objects.get(user=self.buyer, recipe=self.omelette)
+        response = client.post(
+            f'/admin/receipt/for_shop/{cart.id}/delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.totals(self.buyer),
+                         {self.milk.id: 500, self.eggs.id: 2})
+        self.assert_totals_consistent()
+
+    def test_update_and_delete_recipe_through_api(self):
+        client = self.client_for(self.author)
+        response = client.patch(f'/api/recipes/{self.pancakes.id}/', {
+            'name': 'Блины', 'text': 'Описание', 'cooking_time': 10,
+            'tags': [self.make_tag().id],
+            'ingredients': [{'id': self.flour.id, 'amount': 300},
+                            {'id': self.eggs.id, 'amount': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.totals(self.buyer), {
+            self.flour.id: 300, self.milk.id: 100, self.eggs.id: 4})
+        response = client.delete(f'/api/recipes/{self.omelette.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.totals(self.buyer),
+                         {self.flour.id: 300, self.eggs.id: 1})
+        self.assert_totals_consistent()
+
+    def test_batch_remove(self):
+        response = self.client.delete(
+            '/api/recipes/shopping_cart/batch/',
+            {'ids': [self.pancakes.id, self.omelette.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.totals(self.buyer), {})
+        self.assert_totals_consistent()
+
+    def test_concurrent_insert_is_retried(self):
+        # Первый проход не видит строку, которую будто бы только что
+        # вставил параллельный запрос, и натыкается на уникальность.
+        select_for_update = ShoppingCartLineQuerySet.select_for_update
+        calls = []
+
+        def stale_select(queryset, *args, **kwargs):
+            calls.append(queryset)
+            if len(calls) == 1:
+                return queryset.none()
+            return select_for_update(queryset, *args, **kwargs)
+
+        with mock.patch.object(ShoppingCartLineQuerySet, 'select_for_update',
+                               stale_select):
+            ShoppingCartLine.objects.apply_deltas(
+                [self.buyer.id], {self.flour.id: 50})
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.totals(self.buyer)[self.flour.id], 250)
+
+
+class RecipeDeletedConcurrentlyTests(FoodgramTransactionTestCase):
+    """Рецепт, удалённый между чтением и вставкой, даёт 404, а не 500."""
+
+    def test_add_deleted_recipe(self):
+        user = self.make_user()
+        recipe = self.make_recipe(user)
+        stale = Receipt.objects.get(pk=recipe.pk)
+        recipe.delete()
+        client = self.client_for(user)
+        with mock.patch.object(ReceiptViewSet, 'get_short_recipe',
+                               return_value=stale):
+            for endpoint in ('favorite', 'shopping_cart'):
+                with self.subTest(endpoint=endpoint):
+                    response = client.post(
+                        f'/api/recipes/{stale.id}/{endpoint}/')
+                    self.assertEqual(response.status_code, 404)
+        self.assertFalse(For_shop.objects.exists())
+        self.assertFalse(ShoppingCartLine.objects.exists())
@@ -0,0 +1,49 @@
+from django.core.cache import cache
+
+from .base import FoodgramTestCase
+
+
+class ReferenceVersionTests(FoodgramTestCase):
+    """Очистка кеша не возвращает старые версии справочников."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for()
+
+    def test_tags_etag_after_cache_flush(self):
+        self.make_tag(1)
+        response = self.client.get('/api/tags/')
+        etag = response['ETag']
+        cache.clear()
+        # Сигнал срабатывает после коммита, в тесте версия не меняется:
+        # так же теряется увеличение счётчика, пропавшее вместе с кешем.
+        self.make_tag(2)
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([tag['slug'] for tag in response.json()],
+                         ['tag-1', 'tag-2'])
+
+    def test_tag_filter_after_cache_flush(self):
+        author = self.make_user()
+        first = self.make_recipe(author, tags=[self.make_tag(1)])
+        response = self.client.get('/api/recipes/?tags=tag-1')
+        self.assertEqual(response.json()['results'][0]['id'], first.id)
+        cache.clear()
+        second = self.make_recipe(author, tags=[self.make_tag(2)])
+        response = self.client.get('/api/recipes/?tags=tag-2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.json()['results']],
+            [second.id])
+
+    def test_autocomplete_after_cache_flush(self):
+        self.make_ingredient(1)
+        response = self.client.get('/api/ingredients/?name=ингр')
+        self.assertEqual(len(response.json()), 1)
+        cache.clear()
+        self.make_ingredient(2)
+        response = self.client.get('/api/ingredients/?name=ингр')
+        self.assertEqual(
+            [ingredient['name'] for ingredient in response.json()],
+            ['Ингредиент 1', 'Ингредиент 2'])
@@ -0,0 +1,111 @@
+import io
+import json
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.utils.datastructures import MultiValueDict
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.fields import ImageField
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+TOO_LARGE = 'Файл больше {:g} МБ.'
+TOO_MANY_PIXELS = 'Картинка больше {:g} мегапикселей.'
+
+
+def too_large_message():
+    return TOO_LARGE.format(settings.RECIPE_IMAGE_MAX_SIZE / (1024 * 1024))
+
+
+def check_dimensions(file):
+    """
+    Проверяет размер картинки по заголовку файла, не декодируя
+    её целиком: защита от «бомб» с огромным числом пикселей.
+    """
+    too_many_pixels = serializers.ValidationError(TOO_MANY_PIXELS.format(
+        settings.RECIPE_IMAGE_MAX_PIXELS / 1_000_000))
+    try:
+        width, height = Image.open(file).size
+    except Image.DecompressionBombError:
+        raise too_many_pixels
+    except OSError:
+        raise serializers.ValidationError(
+            Base64ImageField.INVALID_FILE_MESSAGE)
+    finally:
+        file.seek(0)
+    if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+        raise too_many_pixels
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет загружаемый файл во временный файл на диске по частям
+    и прерывает загрузку, как только он превысил RECIPE_IMAGE_MAX_SIZE.
+    """
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.RECIPE_IMAGE_MAX_SIZE:
+            raise serializers.ValidationError(
+                {self.field_name: [too_large_message()]})
+        return super().receive_data_chunk(raw_data, start)
+
+
+class MultiPartData(dict):
+    """
+    Поля формы обычным словарём. Request.data в DRF склеивает данные
+    и файлы через copy() и update(), файлы при этом должны попасть
+    по одному, а не списками из MultiValueDict.
+    """
+
+    def copy(self):
+        return type(self)(self)
+
+    def update(self, other=(), **kwargs):
+        if isinstance(other, MultiValueDict):
+            other = other.dict()
+        super().update(other, **kwargs)
+
+
+class MultiPartJSONParser(MultiPartParser):
+    """
+    multipart/form-data для рецептов: картинка приходит файлом,
+    ingredients и tags - JSON-строками в том же формате, что и в теле
+    JSON-запроса. Остальные поля берутся как есть.
+    """
+    json_fields = ('ingredients', 'tags')
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parsed = super().parse(stream, media_type, parser_context)
+        data = parsed.data.dict()
+        for field in self.json_fields:
+            if field in data:
+                try:
+                    data[field] = json.loads(data[field])
+                except ValueError:
+                    raise ParseError(f'{field}: ожидается JSON')
+        return DataAndFiles(MultiPartData(data), parsed.files)
+
+
+class RecipeImageField(Base64ImageField):
+    """
+    Картинка рецепта: строка base64 или файл из multipart/form-data.
+    Размер файла и число пикселей проверяются до разбора картинки.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            if data.size > settings.RECIPE_IMAGE_MAX_SIZE:
+                raise serializers.ValidationError(too_large_message())
+            check_dimensions(data)
+            return ImageField.to_internal_value(self, data)
+        if (isinstance(data, str) and len(data.split(';base64,')[-1]) * 3
+                // 4 > settings.RECIPE_IMAGE_MAX_SIZE):
+            raise serializers.ValidationError(too_large_message())
+        return super().to_internal_value(data)
+
+    def get_file_extension(self, filename, decoded_file):
+        check_dimensions(io.BytesIO(decoded_file))
+        return super().get_file_extension(filename, decoded_file)
@@ -1,16 +1,21 @@
-from django.http import HttpResponse
-from django.db.models import Sum
+from django.http import Http404, StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Count, Prefetch
 from django.shortcuts import get_object_or_404
 from rest_framework.response import Response
-from rest_framework import permissions, status, viewsets, filters, mixins
+from rest_framework import permissions, status, viewsets, filters
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from users.models import User, Subscriptions
-from receipt.models import Ingredient, Receipt, Tag, Favorite, For_shop
+from receipt.models import (Ingredient, Receipt, Tag, Favorite, For_shop,
+                            ShoppingCartLine)
+from receipt.autocomplete import ingredient_index
+from receipt.versions import INGREDIENTS, TAGS
 from .serializers import (SubscribeSerializer,
                           IngredientSerializer, TagSerializer,
                           ReceiptCreateSerializer,
                           ReceiptReadSerializer,
-                          Quantity_ingredientes, FavoriteSerializer,
+                          FavoriteSerializer,
                           ForShopSerializer, UserSubscribeSerializer,
                           CustomUserCreateSerializer, CustomPasswordSerializer,
                           CustomUserSerializer, )
@@ -18,10 +23,12 @@ from .permissions import IsAuthorOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
 from .filters import ReceiptFilter
 from djoser.views import UserViewSet
-from .mixins import ListSubscriptionViewSet
-from .paginators import PageLimitPagination
-
-FILE = 'shop.txt'
+from .mixins import ListSubscriptionViewSet, ReferenceViewSet
+from .batch import SELF, add_links, get_ids, remove_links, summary
+from .paginators import ApproximateCountPagination, PageLimitPagination
+from .recipe_cache import get_recipe_payloads
+from .renderers import SHOPPING_LIST_RENDERERS
+from .uploads import LimitedTemporaryFileUploadHandler, MultiPartJSONParser
 
 
 class CustomUserViewSet(UserViewSet):
@@ -79,67 +86,127 @@ class CustomUserViewSet(UserViewSet):
             return Response(
                 status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        methods=('post', 'delete',),
+        detail=False,
+        url_path='subscribe/batch',
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def subscribe_batch(self, request):
+        user = request.user
+        ids = get_ids(request)
+        with transaction.atomic():
+            if request.method == 'POST':
+                statuses, _ = add_links(Subscriptions, user, 'author', ids,
+                                        User.objects.exclude(pk=user.pk))
+                if user.pk in ids:
+                    statuses[user.pk] = SELF
+            else:
+                statuses, _ = remove_links(Subscriptions, user, 'author',
+                                           ids)
+        return Response(summary(ids, statuses))
+
 
 class SubscriptionViewSet(ListSubscriptionViewSet):
     serializer_class = UserSubscribeSerializer
     permission_classes = (permissions.IsAuthenticated,)
     pagination_class = PageLimitPagination
+    cursor_ordering = ('username',)
 
     def get_queryset(self):
-        return User.objects.filter(subscription__user=self.request.user)
+        recipes = Receipt.objects.all()
+        limit = self.request.query_params.get('recipes_limit')
+        if limit and limit.isdigit():
+            recipes = recipes.latest_per_author(int(limit))
+        return (
+            User.objects.filter(subscription__user=self.request.user)
+            .annotate(recipes_count=Count('recipes', distinct=True))
+            .prefetch_related(Prefetch('recipes', queryset=recipes,
+                                       to_attr='recipes_preview'))
+            .order_by('username')
+        )
 
 
-class IngredientViewSet(mixins.ListModelMixin,
-                        mixins.RetrieveModelMixin,
-                        viewsets.GenericViewSet):
+class IngredientViewSet(ReferenceViewSet):
     queryset = Ingredient.objects.all()
-    permission_classes = (permissions.AllowAny, )
     serializer_class = IngredientSerializer
-    pagination_class = None
     filter_backends = (filters.SearchFilter, )
     search_fields = ('^name', )
+    version_name = INGREDIENTS
+
+    def list(self, request, *args, **kwargs):
+        if 'name' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        return self.conditional(self.autocomplete, request)
 
+    def autocomplete(self, request):
+        return Response(
+            ingredient_index.search(request.query_params['name']))
 
-class TagViewSet(mixins.ListModelMixin,
-                 mixins.RetrieveModelMixin,
-                 viewsets.GenericViewSet):
-    permission_classes = (permissions.AllowAny, )
+
+class TagViewSet(ReferenceViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
-    pagination_class = None
+    version_name = TAGS
 
 
 class ReceiptViewSet(viewsets.ModelViewSet):
-    queryset = Receipt.objects.all()
     permission_classes = (IsAuthorOrReadOnly, )
-    pagination_class = PageLimitPagination
+    pagination_class = ApproximateCountPagination
     filter_backends = (DjangoFilterBackend, )
     filterset_class = ReceiptFilter
+    cursor_ordering = ('-pub_date', '-id')
+    cursor_excluded_params = ('search',)
     http_method_names = ['get', 'post', 'patch', 'create', 'delete']
+    parser_classes = (JSONParser, MultiPartJSONParser)
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [LimitedTemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return ReceiptReadSerializer
         return ReceiptCreateSerializer
 
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        context.update({"request": self.request,
-                        "favorite": Favorite.objects
-                        .filter(user_id=self.request.user)
-                        .values_list('recipe_id', flat=True),
-                        "shopping_cart": For_shop.objects
-                        .filter(user_id=self.request.user)
-                        .values_list('recipe_id', flat=True)})
-        return context
+    def get_queryset(self):
+        queryset = Receipt.objects.all()
+        if self.action in ('list', 'retrieve'):
+            # search_vector нужен только поиску в SQL, в ответ не идёт.
+            return queryset.with_user_flags(self.request.user).defer(
+                'search_vector')
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                get_recipe_payloads(page, request))
+        return Response(get_recipe_payloads(list(queryset), request))
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            ShoppingCartLine.objects.forget_recipe(instance)
+            instance.delete()
+
+    def retrieve(self, request, *args, **kwargs):
+        payloads = get_recipe_payloads([self.get_object()], request)
+        if not payloads:
+            raise Http404
+        return Response(payloads[0])
 
+    def get_short_recipe(self, pk):
+        """Рецепт с полями, которые нужны в ответе на добавление."""
+        return get_object_or_404(
+            Receipt.objects.only('name', 'image', 'cooking_time'), pk=pk)
 
     @action(detail=True, methods=['post', 'delete'],
             permission_classes=(permissions.IsAuthenticated,))
     def favorite(self, request, **kwargs):
-        recipe = get_object_or_404(Receipt, id=kwargs['pk'])
         user = request.user
         if request.method == 'POST':
+            recipe = self.get_short_recipe(kwargs['pk'])
             data = {'user': user.id, 'recipe': recipe.id}
             serializer = FavoriteSerializer(context={
                  'recipe': recipe,
@@ -153,8 +220,8 @@ class ReceiptViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_400_BAD_REQUEST)
 
         if request.method == 'DELETE':
-            get_object_or_404(Favorite, user=request.user,
-                              recipe=recipe).delete()
+            if not Favorite.objects.remove(user, kwargs['pk']):
+                raise Http404
             return Response({'detail': 'Рецепт удален из избранного'},
                             status=status.HTTP_204_NO_CONTENT)
 
@@ -162,9 +229,9 @@ class ReceiptViewSet(viewsets.ModelViewSet):
             permission_classes=(permissions.IsAuthenticated,),
             pagination_class=None)
     def shopping_cart(self, request, **kwargs):
-        recipe = get_object_or_404(Receipt, id=kwargs['pk'])
         user = request.user
         if request.method == 'POST':
+            recipe = self.get_short_recipe(kwargs['pk'])
             data = {'user': user.id, 'recipe': recipe.id}
             serializer = ForShopSerializer(context={
                  'recipe': recipe,
@@ -178,29 +245,60 @@ class ReceiptViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_400_BAD_REQUEST)
 
         if request.method == 'DELETE':
-            get_object_or_404(For_shop, user=request.user,
-                              recipe=recipe).delete()
+            with transaction.atomic():
+                if not For_shop.objects.remove(user, kwargs['pk']):
+                    raise Http404
+                ShoppingCartLine.objects.remove_recipe(user, kwargs['pk'])
             return Response(
                 {'detail': 'Рецепт успешно удален из списка покупок.'},
                 status=status.HTTP_204_NO_CONTENT
             )
 
-    @action(detail=False, methods=['get'],
+    @action(detail=False, methods=['post', 'delete'],
+            url_path='favorite/batch',
+            permission_classes=(permissions.IsAuthenticated,))
+    def favorite_batch(self, request, **kwargs):
+        ids = get_ids(request)
+        with transaction.atomic():
+            if request.method == 'POST':
+                statuses, _ = add_links(Favorite, request.user, 'recipe',
+                                        ids, Receipt.objects.all())
+            else:
+                statuses, _ = remove_links(Favorite, request.user, 'recipe',
+                                           ids)
+        return Response(summary(ids, statuses))
+
+    @action(detail=False, methods=['post', 'delete'],
+            url_path='shopping_cart/batch',
             permission_classes=(permissions.IsAuthenticated,))
+    def shopping_cart_batch(self, request, **kwargs):
+        ids = get_ids(request)
+        with transaction.atomic():
+            if request.method == 'POST':
+                statuses, added = add_links(For_shop, request.user, 'recipe',
+                                            ids, Receipt.objects.all())
+                ShoppingCartLine.objects.add_recipes(request.user, added)
+            else:
+                statuses, removed = remove_links(For_shop, request.user,
+                                                 'recipe', ids)
+                ShoppingCartLine.objects.remove_recipes(request.user, removed)
+        return Response(summary(ids, statuses))
+
+    @action(detail=False, methods=['get'],
+            permission_classes=(permissions.IsAuthenticated,),
+            renderer_classes=SHOPPING_LIST_RENDERERS)
     def download_shopping_cart(self, request, **kwargs):
         ingredients = (
-            Quantity_ingredientes.objects
-            .filter(recipe__shopping_recipe__user=request.user)
-            .values('ingredient')
-            .annotate(total_amount=Sum('amount'))
+            ShoppingCartLine.objects
+            .filter(user=request.user)
             .values_list('ingredient__name', 'total_amount',
                          'ingredient__measurement_unit')
+            .order_by('ingredient__name')
         )
-        file_list = []
-        [file_list.append(
-            '{} - {} {}.'.format(*ingredient)) for ingredient in ingredients]
-        file = HttpResponse('Cписок покупок:\n' + '\n'.join(file_list),
-                            content_type='text/plain')
-        file['Content-Disposition'] = (f'attachment; filename={FILE}')
-        return file
-
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients.iterator()),
+            content_type=renderer.get_content_type())
+        response['Content-Disposition'] = (
+            f'attachment; filename={renderer.get_filename()}')
+        return response
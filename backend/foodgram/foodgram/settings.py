@@ -55,6 +55,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -100,6 +101,66 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', 60 * 60))
+# Собирать рецепты для кеша из values() без ReceiptReadSerializer.
+RECIPE_FAST_READ = os.getenv('RECIPE_FAST_READ', 'true').lower() == 'true'
+# Ограничения на картинку рецепта: размер файла в байтах и число пикселей.
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.getenv('RECIPE_IMAGE_MAX_SIZE', 10 * 1024 * 1024))
+RECIPE_IMAGE_MAX_PIXELS = int(os.getenv('RECIPE_IMAGE_MAX_PIXELS', 40_000_000))
+# Готовить варианты картинок рецептов прямо в запросе. В продакшене
+# выключено: их готовит сервис generate_image_variants --watch.
+IMAGE_PROCESSING_INLINE = os.getenv(
+    'IMAGE_PROCESSING_INLINE', 'false').lower() == 'true'
+# Как часто generate_image_variants --watch ищет новые картинки, секунд.
+IMAGE_PROCESSING_INTERVAL = int(os.getenv('IMAGE_PROCESSING_INTERVAL', 5))
+# Сколько секунд хранить в кеше пользователя, найденного по токену.
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', 60))
+
+# Запросы медленнее или с большим числом SQL-запросов пишутся в лог.
+METRICS_SLOW_REQUEST_MS = int(os.getenv('METRICS_SLOW_REQUEST_MS', 500))
+METRICS_SLOW_QUERY_COUNT = int(os.getenv('METRICS_SLOW_QUERY_COUNT', 50))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {
+            'format': '%(message)s',
+        },
+    },
+    'handlers': {
+        'metrics': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'plain',
+        },
+    },
+    'loggers': {
+        'foodgram.metrics': {
+            'handlers': ['metrics'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_URLS_REGEX = r'^/api/.*$'
 
@@ -143,6 +204,12 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static_backend')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media') 
 
+# TTF-шрифт с кириллицей для выгрузки списка покупок в PDF.
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -157,9 +224,13 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
@@ -169,6 +240,15 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 6,
 }
 
+# Наибольшее значение параметра limit в постраничных ответах API.
+PAGINATION_MAX_LIMIT = int(os.getenv('PAGINATION_MAX_LIMIT', 100))
+# Выше этого числа строк count в ответе на PostgreSQL становится
+# приблизительным.
+PAGINATION_EXACT_COUNT_LIMIT = int(
+    os.getenv('PAGINATION_EXACT_COUNT_LIMIT', 1000))
+# Сколько id можно передать в одном пакетном запросе.
+BATCH_MAX_IDS = int(os.getenv('BATCH_MAX_IDS', 100))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=10),
     'AUTH_HEADER_TYPES': ('Bearer',),
@@ -0,0 +1,27 @@
+import os
+import shutil
+
+
+def on_starting(server):
+    """
+    Очищает метрики воркеров от предыдущего запуска и не даёт запустить
+    несколько воркеров без общего кеша.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    from receipt.versions import is_shared_cache
+
+    if server.cfg.workers > 1 and not is_shared_cache():
+        raise RuntimeError(
+            'Несколько воркеров с LocMemCache не видят изменений друг '
+            'друга: задайте REDIS_URL или WEB_CONCURRENCY=1')
+    path = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,8 +1,49 @@
 from django.contrib import admin
+from django.db import transaction
 
 from . import models
 
 
+class ShoppingCartAdminMixin:
+    """
+    Пересобирает списки покупок пользователей, чьи корзины задела
+    правка в админке. cart_users(queryset) возвращает их id до и после
+    изменения строк queryset, cart_fields - поля, правка которых
+    меняет итоги.
+    """
+    cart_fields = ()
+
+    def cart_users(self, queryset):
+        raise NotImplementedError
+
+    def rebuild_carts(self, users):
+        if users:
+            models.ShoppingCartLine.objects.rebuild(users)
+
+    def save_model(self, request, obj, form, change):
+        if change and not set(self.cart_fields) & set(form.changed_data):
+            super().save_model(request, obj, form, change)
+            return
+        rows = type(obj).objects.filter(pk=obj.pk)
+        with transaction.atomic():
+            users = set(self.cart_users(rows)) if change else set()
+            super().save_model(request, obj, form, change)
+            self.rebuild_carts(users | set(self.cart_users(rows)))
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            users = set(self.cart_users(
+                type(obj).objects.filter(pk=obj.pk)))
+            super().delete_model(request, obj)
+            self.rebuild_carts(users)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            users = set(self.cart_users(queryset))
+            super().delete_queryset(request, queryset)
+            self.rebuild_carts(users)
+
+
 @admin.register(models.Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('__str__', 'measurement_unit')
@@ -17,8 +58,13 @@ class TagAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+def recipe_cart_users(recipes):
+    return models.For_shop.objects.filter(recipe__in=recipes).values_list(
+        'user_id', flat=True)
+
+
 @admin.register(models.Receipt)
-class ReceiptAdmin(admin.ModelAdmin):
+class ReceiptAdmin(ShoppingCartAdminMixin, admin.ModelAdmin):
     list_display = ('__str__', 'name', 'cooking_time', 'text',
                     'image', 'author', 'in_favorites')
     list_editable = (
@@ -33,11 +79,18 @@ class ReceiptAdmin(admin.ModelAdmin):
     def in_favorites(self, obj):
         return obj.favorite_recipe.count()
 
+    def cart_users(self, queryset):
+        return recipe_cart_users(queryset)
+
 
 @admin.register(models.Quantity_ingredientes)
-class QuantityIngredientAdmin(admin.ModelAdmin):
+class QuantityIngredientAdmin(ShoppingCartAdminMixin, admin.ModelAdmin):
     list_display = ('__str__', 'recipe', 'ingredient', 'amount')
     list_editable = ('recipe', 'ingredient', 'amount')
+    cart_fields = ('recipe', 'ingredient', 'amount')
+
+    def cart_users(self, queryset):
+        return recipe_cart_users(queryset.values('recipe_id'))
 
 
 @admin.register(models.Favorite)
@@ -47,6 +100,16 @@ class FavoriteAdmin(admin.ModelAdmin):
 
 
 @admin.register(models.For_shop)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(ShoppingCartAdminMixin, admin.ModelAdmin):
     list_display = ('__str__', 'user', 'recipe')
     list_editable = ('user', 'recipe')
+    cart_fields = ('user', 'recipe')
+
+    def cart_users(self, queryset):
+        return queryset.values_list('user_id', flat=True)
+
+
+@admin.register(models.ShoppingCartLine)
+class ShoppingCartLineAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'user', 'ingredient', 'total_amount')
+    list_filter = ('user', )
@@ -0,0 +1,65 @@
+import threading
+from bisect import bisect_left
+
+from .versions import INGREDIENTS, get_version
+
+LAST_CHAR = chr(0x10FFFF)
+
+
+class IngredientIndex:
+    """
+    Индекс ингредиентов в памяти воркера для автодополнения.
+
+    Хранит ингредиенты отсортированными по названию в нижнем регистре,
+    поиск по началу названия - двоичный поиск по этому массиву.
+    Строится при первом запросе и перестраивается, когда меняется
+    версия справочника в кеше (её увеличивают сигналы модели Ingredient).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = ([], [])
+
+    def _build(self, version):
+        from receipt.models import Ingredient
+
+        rows = sorted(
+            (name.casefold(), ingredient_id, name, measurement_unit)
+            for ingredient_id, name, measurement_unit in
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit')
+        )
+        self._data = (
+            [row[0] for row in rows],
+            [{'id': ingredient_id, 'name': name,
+              'measurement_unit': measurement_unit}
+             for _, ingredient_id, name, measurement_unit in rows],
+        )
+        self._version = version
+
+    def _ensure_fresh(self):
+        version = get_version(INGREDIENTS)
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self._build(version)
+
+    def search(self, query):
+        """
+        Ингредиенты, в названии которых есть query: сначала те,
+        что с него начинаются, затем остальные, внутри групп - по алфавиту.
+        """
+        self._ensure_fresh()
+        keys, items = self._data
+        query = query.strip().casefold()
+        if not query:
+            return list(items)
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + LAST_CHAR, start)
+        return items[start:end] + [
+            items[position] for position, key in enumerate(keys)
+            if query in key and not start <= position < end
+        ]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,222 @@
+import io
+import random
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+
+from receipt.models import (Favorite, For_shop, ImageBlob, Ingredient,
+                            Quantity_ingredientes, Receipt, ShoppingCartLine,
+                            Tag)
+from receipt.storage import recipe_images
+from receipt.versions import INGREDIENTS, TAGS, bump_version
+from users.models import Subscriptions, User
+
+PREFIX = 'bench'
+PASSWORD = 'bench-password'
+IMAGE_NAME = f'posts/{PREFIX}.png'
+WORDS = (
+    'суп', 'борщ', 'салат', 'пирог', 'каша', 'омлет', 'рагу', 'плов',
+    'запеканка', 'котлеты', 'блины', 'оладьи', 'паста', 'ризотто', 'соус',
+    'куриный', 'овощной', 'грибной', 'сырный', 'томатный', 'быстрый',
+    'домашний', 'пряный', 'сладкий', 'острый', 'летний', 'зимний',
+)
+
+
+def sample_pairs(rng, owners, targets, total, exclude_self=False):
+    """
+    Уникальные пары (владелец, цель): total пар поровну на владельцев,
+    цели для каждого выбираются без повторов.
+    """
+    if not owners or not targets:
+        return
+    per_owner, extra = divmod(total, len(owners))
+    available = len(targets) - exclude_self
+    for position, owner in enumerate(owners):
+        count = min(per_owner + (position < extra), available)
+        chosen = rng.sample(targets, min(count + exclude_self, len(targets)))
+        if exclude_self:
+            chosen = [target for target in chosen if target != owner]
+        for target in chosen[:count]:
+            yield owner, target
+
+
+class Command(BaseCommand):
+    """
+    Генерируем синтетические данные для нагрузочного тестирования
+    """
+    help = ('Создаёт воспроизводимый набор пользователей, рецептов, '
+            'избранного, корзин и подписок заданного размера')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', default=1, type=int,
+                            help='Зерно генератора: одинаковое зерно '
+                                 'даёт одинаковые данные')
+        parser.add_argument('--users', default=1000, type=int)
+        parser.add_argument('--recipes', default=10000, type=int)
+        parser.add_argument('--tags', default=10, type=int)
+        parser.add_argument('--ingredients', default=500, type=int,
+                            help='Сколько ингредиентов создать, если '
+                                 'справочник пуст')
+        parser.add_argument('--ingredients-per-recipe', default=8, type=int)
+        parser.add_argument('--favorites', default=100000, type=int)
+        parser.add_argument('--carts', default=10000, type=int)
+        parser.add_argument('--subscriptions', default=20000, type=int)
+        parser.add_argument('--batch-size', default=5000, type=int,
+                            help='Сколько строк вставлять за один запрос')
+        parser.add_argument('--clear', action='store_true',
+                            help='Удалить ранее сгенерированные данные '
+                                 'перед генерацией')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        self.batch_size = options['batch_size']
+        self.seed = options['seed']
+        if options['clear']:
+            self.clear()
+        elif User.objects.filter(username__startswith=f'{PREFIX}_').exists():
+            raise CommandError('Сгенерированные данные уже есть, '
+                               'запустите команду с --clear')
+        started = time.monotonic()
+        tag_ids = self.make_tags(options['tags'])
+        ingredient_ids = self.make_ingredients(options['ingredients'])
+        user_ids = self.make_users(options['users'])
+        recipe_ids = self.make_recipes(
+            options['recipes'], user_ids, tag_ids, ingredient_ids,
+            options['ingredients_per_recipe'])
+        self.insert(Favorite, (
+            Favorite(user_id=user_id, recipe_id=recipe_id)
+            for user_id, recipe_id in sample_pairs(
+                self.random('favorites'), user_ids, recipe_ids,
+                options['favorites'])
+        ))
+        self.insert(For_shop, (
+            For_shop(user_id=user_id, recipe_id=recipe_id)
+            for user_id, recipe_id in sample_pairs(
+                self.random('carts'), user_ids, recipe_ids,
+                options['carts'])
+        ))
+        self.insert(Subscriptions, (
+            Subscriptions(user_id=user_id, author_id=author_id)
+            for user_id, author_id in sample_pairs(
+                self.random('subscriptions'), user_ids, user_ids,
+                options['subscriptions'],
+                exclude_self=True)
+        ))
+        ShoppingCartLine.objects.rebuild()
+        self.stdout.write(
+            f'{ShoppingCartLine._meta.verbose_name_plural}: '
+            f'{ShoppingCartLine.objects.count()}')
+        bump_version(INGREDIENTS)
+        bump_version(TAGS)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с'))
+
+    def clear(self):
+        with transaction.atomic():
+            deleted, _ = User.objects.filter(
+                username__startswith=f'{PREFIX}_').delete()
+            Tag.objects.filter(slug__startswith=f'{PREFIX}-').delete()
+        self.stdout.write(f'Удалено сгенерированных объектов: {deleted}')
+
+    def random(self, name):
+        """
+        Отдельный генератор на каждый вид данных: результат одного шага
+        не зависит от того, выполнялись ли остальные.
+        """
+        return random.Random(f'{self.seed}:{name}')
+
+    def insert(self, model, objects):
+        """Вставляет объекты пачками по batch_size и сообщает скорость."""
+        started = time.monotonic()
+        created = 0
+        objects = iter(objects)
+        with transaction.atomic():
+            while batch := list(islice(objects, self.batch_size)):
+                model.objects.bulk_create(batch)
+                created += len(batch)
+        elapsed = time.monotonic() - started or 1e-9
+        self.stdout.write(
+            f'{model._meta.verbose_name_plural}: {created} '
+            f'({created / elapsed:.0f} строк/с)')
+
+    def make_tags(self, count):
+        rng = self.random('tags')
+        self.insert(Tag, (
+            Tag(name=f'{PREFIX} {number}', slug=f'{PREFIX}-{number}',
+                color=f'#{rng.randrange(0x1000000):06X}')
+            for number in range(count)
+        ))
+        return list(Tag.objects.filter(
+            slug__startswith=f'{PREFIX}-').order_by('id').values_list(
+                'id', flat=True))
+
+    def make_ingredients(self, count):
+        if not Ingredient.objects.exists():
+            rng = self.random('ingredients')
+            self.insert(Ingredient, (
+                Ingredient(name=f'{rng.choice(WORDS)} {number}',
+                           measurement_unit=rng.choice(('г', 'мл', 'шт.')))
+                for number in range(count)
+            ))
+        return list(Ingredient.objects.order_by('id').values_list(
+            'id', flat=True))
+
+    def make_users(self, count):
+        password = make_password(PASSWORD)
+        self.insert(User, (
+            User(username=f'{PREFIX}_{number}',
+                 email=f'{PREFIX}_{number}@example.com',
+                 first_name='Тест', last_name=f'Пользователь {number}',
+                 password=password)
+            for number in range(count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=f'{PREFIX}_').order_by('id').values_list(
+                'id', flat=True))
+
+    def make_image(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), (240, 200, 120)).save(buffer, 'PNG')
+        return recipe_images.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+
+    def make_recipes(self, count, user_ids, tag_ids, ingredient_ids,
+                     per_recipe):
+        if count and not user_ids:
+            raise CommandError('Для рецептов нужен хотя бы один пользователь')
+        image = self.make_image()
+        rng = self.random('recipes')
+        self.insert(Receipt, (
+            Receipt(author_id=rng.choice(user_ids),
+                    name=' '.join(rng.sample(WORDS, 3)).capitalize(),
+                    text=' '.join(rng.choices(WORDS, k=30)),
+                    cooking_time=rng.randint(5, 180),
+                    image=image)
+            for _ in range(count)
+        ))
+        # bulk_create не отправляет сигналы, ссылки считаем сами.
+        ImageBlob.objects.recount([image])
+        recipe_ids = list(Receipt.objects.filter(
+            author_id__in=user_ids).order_by('id').values_list(
+                'id', flat=True))
+        per_recipe = min(per_recipe, len(ingredient_ids))
+        self.insert(Quantity_ingredientes, (
+            Quantity_ingredientes(recipe_id=recipe_id,
+                                  ingredient_id=ingredient_id,
+                                  amount=rng.randint(1, 500))
+            for recipe_id in recipe_ids
+            for ingredient_id in rng.sample(ingredient_ids, per_recipe)
+        ))
+        recipe_tags = Receipt.tags.through
+        self.insert(recipe_tags, (
+            recipe_tags(receipt_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rng.sample(
+                tag_ids, min(len(tag_ids), rng.randint(1, 3)))
+        ))
+        return recipe_ids
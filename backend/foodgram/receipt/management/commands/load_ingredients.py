@@ -1,34 +1,144 @@
 import csv
+import io
+import json
 import os
+import time
+from functools import partial
+from itertools import islice
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
 from receipt.models import Ingredient
+from receipt.versions import INGREDIENTS, bump_version
 
 DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """Читает JSON-массив объектов по частям, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('JSON-файл должен содержать список ингредиентов')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('JSON-файл оборван или повреждён')
+            buffer += chunk
+            continue
+        yield item['name'], item['measurement_unit']
+        buffer = buffer[end:]
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
 
 
 class Command(BaseCommand):
     """
-    Переносим данные из csv в базу данных
+    Переносим данные из csv или json в базу данных
     """
-    help = 'Добавляем ингредиенты из файла ingredients.csv'
+    help = ('Добавляем ингредиенты из файла ingredients.csv '
+            'или ingredients.json')
 
     def add_arguments(self, parser):
         parser.add_argument('filename', default='ingredients.csv', nargs='?',
                             type=str)
+        parser.add_argument('--batch-size', default=1000, type=int,
+                            help='Сколько строк вставлять за один запрос')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Прочитать файл, ничего не записывая')
+        parser.add_argument('--truncate', action='store_true',
+                            help='Удалить все ингредиенты (вместе с составом '
+                                 'рецептов) перед загрузкой')
+        parser.add_argument('--no-copy', action='store_true',
+                            help='Не использовать COPY на PostgreSQL')
 
     def handle(self, *args, **options):
+        path = os.path.join(DATA_ROOT, options['filename'])
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .csv и .json')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        use_copy = (connection.vendor == 'postgresql'
+                    and not options['no_copy'])
         try:
-            with open(os.path.join(DATA_ROOT, options['filename']), 'r',
-                      encoding='utf-8') as f:
-                data = csv.reader(f)
-                for row in data:
-                    name, measurement_unit = row
-                    Ingredient.objects.get_or_create(
-                        name=name,
-                        measurement_unit=measurement_unit
-                    )
+            with open(path, 'r', encoding='utf-8') as f:
+                with transaction.atomic():
+                    if options['truncate'] and not options['dry_run']:
+                        Ingredient.objects.all().delete()
+                    self.load(reader(f), options['batch_size'],
+                              options['dry_run'], use_copy)
+                    if options['dry_run']:
+                        transaction.set_rollback(True)
+                    else:
+                        transaction.on_commit(
+                            partial(bump_version, INGREDIENTS))
         except FileNotFoundError:
-            raise CommandError('Не обнаружен ingredients.csv')
+            raise CommandError(f'Не обнаружен {options["filename"]}')
+
+    def load(self, rows, batch_size, dry_run, use_copy):
+        seen = set(Ingredient.objects.values_list('name', 'measurement_unit'))
+        read = created = 0
+        started = time.monotonic()
+        rows = iter(rows)
+        while chunk := list(islice(rows, batch_size)):
+            read += len(chunk)
+            batch = []
+            for name, measurement_unit in chunk:
+                key = (name.strip(), measurement_unit.strip())
+                if key not in seen:
+                    seen.add(key)
+                    batch.append(key)
+            if batch and not dry_run:
+                if use_copy:
+                    self.copy(batch)
+                else:
+                    Ingredient.objects.bulk_create(
+                        [Ingredient(name=name,
+                                    measurement_unit=measurement_unit)
+                         for name, measurement_unit in batch],
+                        ignore_conflicts=True
+                    )
+            created += len(batch)
+            self.report(read, created, started)
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Будет добавлено" if dry_run else "Добавлено"}: {created}, '
+            f'пропущено повторов: {read - created}'))
+
+    def copy(self, batch):
+        buffer = io.StringIO()
+        csv.writer(buffer, delimiter='\t', lineterminator='\n').writerows(
+            batch)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {Ingredient._meta.db_table} (name, measurement_unit) '
+                "FROM STDIN WITH (FORMAT csv, DELIMITER E'\\t')",
+                buffer
+            )
+
+    def report(self, read, created, started):
+        elapsed = time.monotonic() - started or 1e-9
+        self.stdout.write(
+            f'Прочитано {read}, новых {created} '
+            f'({read / elapsed:.0f} строк/с)')
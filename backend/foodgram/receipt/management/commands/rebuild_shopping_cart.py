@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from receipt.models import ShoppingCartLine
+
+
+class Command(BaseCommand):
+    """
+    Пересчитываем таблицу строк списков покупок
+    """
+    help = ('Пересобирает ShoppingCartLine по рецептам в корзинах '
+            'или сверяет её с ними (--verify)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Только сверить таблицу, ничего не меняя')
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            ShoppingCartLine.objects.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                'Строк в списках покупок: '
+                f'{ShoppingCartLine.objects.count()}'))
+            return
+        expected = ShoppingCartLine.objects.live_totals()
+        stored = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total in
+            ShoppingCartLine.objects.values_list(
+                'user_id', 'ingredient_id', 'total_amount').iterator()
+        }
+        mismatches = [
+            (key, stored.get(key), expected.get(key))
+            for key in expected.keys() | stored.keys()
+            if stored.get(key) != expected.get(key)
+        ]
+        for (user_id, ingredient_id), got, want in sorted(mismatches):
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'в таблице {got}, должно быть {want}')
+        if mismatches:
+            raise CommandError(
+                f'Расхождений: {len(mismatches)}. '
+                'Запустите команду без --verify для пересборки.')
+        self.stdout.write(self.style.SUCCESS('Расхождений нет'))
@@ -8,6 +8,8 @@ def named_tuple_fetch_all(cursor):
     return [Result(*row) for row in cursor.fetchall()]
 def rename_indexes(apps, schema_editor):
     from django.db import connection
+    if connection.vendor != 'postgresql':
+        return
     with connection.cursor() as cursor:
         cursor.execute(
             """SELECT indexname FROM pg_indexes 
@@ -24,6 +26,8 @@ def rename_indexes(apps, schema_editor):
             )
 def rename_foreignkeys(apps, schema_editor):
     from django.db import connection
+    if connection.vendor != 'postgresql':
+        return
     with connection.cursor() as cursor:
         cursor.execute(
             """SELECT table_name, constraint_name 
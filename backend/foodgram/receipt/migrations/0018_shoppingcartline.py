@@ -0,0 +1,54 @@
+# Generated by Django 4.2 on 2026-10-18 17:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_shopping_cart_lines(apps, schema_editor):
+    Quantity = apps.get_model('receipt', 'Quantity_ingredientes')
+    ShoppingCartLine = apps.get_model('receipt', 'ShoppingCartLine')
+    totals = (
+        Quantity.objects
+        .filter(recipe__shopping_recipe__isnull=False)
+        .values('recipe__shopping_recipe__user', 'ingredient')
+        .annotate(total=models.Sum('amount'))
+        .values_list('recipe__shopping_recipe__user', 'ingredient', 'total')
+        .order_by()
+    )
+    ShoppingCartLine.objects.bulk_create(
+        [ShoppingCartLine(user_id=user_id, ingredient_id=ingredient_id,
+                          total_amount=total)
+         for user_id, ingredient_id, total in totals],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('receipt', '0017_alter_ingredient_options_alter_receipt_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_lines', to='receipt.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_lines', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Строка списка покупок',
+                'verbose_name_plural': 'Строки списков покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcartline',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_cart_line'),
+        ),
+        migrations.RunPython(fill_shopping_cart_lines,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2 on 2026-10-18 17:18
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Сливает одинаковые ингредиенты в запись с наименьшим id."""
+    Ingredient = apps.get_model('receipt', 'Ingredient')
+    Quantity = apps.get_model('receipt', 'Quantity_ingredientes')
+    ShoppingCartLine = apps.get_model('receipt', 'ShoppingCartLine')
+    duplicates = (
+        Ingredient.objects
+        .values('name', 'measurement_unit')
+        .annotate(keep_id=models.Min('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    for group in duplicates:
+        keep_id = group['keep_id']
+        drop_ids = list(
+            Ingredient.objects
+            .filter(name=group['name'],
+                    measurement_unit=group['measurement_unit'])
+            .exclude(id=keep_id)
+            .values_list('id', flat=True)
+        )
+        for Model, owner, amount in (
+            (Quantity, 'recipe_id', 'amount'),
+            (ShoppingCartLine, 'user_id', 'total_amount'),
+        ):
+            kept = {
+                getattr(row, owner): row
+                for row in Model.objects.filter(ingredient_id=keep_id)
+            }
+            for row in Model.objects.filter(ingredient_id__in=drop_ids):
+                target = kept.get(getattr(row, owner))
+                if target is None:
+                    row.ingredient_id = keep_id
+                    row.save(update_fields=['ingredient'])
+                    kept[getattr(row, owner)] = row
+                    continue
+                setattr(target, amount,
+                        getattr(target, amount) + getattr(row, amount))
+                target.save(update_fields=[amount])
+                row.delete()
+        Ingredient.objects.filter(id__in=drop_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipt', '0018_shoppingcartline'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ingredients,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2 on 2026-10-18 17:18
+
+from django.db import DatabaseError, migrations, models, transaction
+
+PREFIX_INDEX = 'receipt_ingredient_name_prefix'
+TRIGRAM_INDEX = 'receipt_ingredient_name_trgm'
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    Индексы для поиска ингредиента по началу названия.
+
+    SearchFilter с '^name' превращается в UPPER(name::text) LIKE 'X%'
+    на PostgreSQL и в name LIKE 'x%' на SQLite, индексы повторяют
+    эти выражения. Триграммный индекс для поиска по подстроке создаётся,
+    только если доступно расширение pg_trgm.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {PREFIX_INDEX} '
+            'ON receipt_ingredient (name COLLATE NOCASE)'
+        )
+        return
+    if vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {PREFIX_INDEX} '
+        'ON receipt_ingredient (UPPER(name::text) text_pattern_ops)'
+    )
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} '
+                'ON receipt_ingredient '
+                'USING gin (UPPER(name::text) gin_trgm_ops)'
+            )
+    except DatabaseError:
+        pass
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    for index in (PREFIX_INDEX, TRIGRAM_INDEX):
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipt', '0019_merge_duplicate_ingredients'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def remove_duplicate_shopping_cart(apps, schema_editor):
+    """
+    Удаляет повторные рецепты в списках покупок, оставляя самую раннюю
+    запись, и пересчитывает строки списков затронутых пользователей.
+    """
+    For_shop = apps.get_model('receipt', 'For_shop')
+    Quantity = apps.get_model('receipt', 'Quantity_ingredientes')
+    ShoppingCartLine = apps.get_model('receipt', 'ShoppingCartLine')
+    duplicates = For_shop.objects.filter(models.Exists(
+        For_shop.objects.filter(user=models.OuterRef('user'),
+                                recipe=models.OuterRef('recipe'),
+                                id__lt=models.OuterRef('id'))
+    ))
+    user_ids = set(duplicates.values_list('user_id', flat=True))
+    while True:
+        batch = list(duplicates.values_list('id', flat=True)[:BATCH_SIZE])
+        if not batch:
+            break
+        For_shop.objects.filter(id__in=batch).delete()
+    if not user_ids:
+        return
+    ShoppingCartLine.objects.filter(user_id__in=user_ids).delete()
+    ShoppingCartLine.objects.bulk_create(
+        [ShoppingCartLine(user_id=user_id, ingredient_id=ingredient_id,
+                          total_amount=total)
+         for user_id, ingredient_id, total in (
+             Quantity.objects
+             .filter(recipe__shopping_recipe__user__in=user_ids)
+             .values('recipe__shopping_recipe__user', 'ingredient')
+             .annotate(total=models.Sum('amount'))
+             .values_list('recipe__shopping_recipe__user', 'ingredient',
+                          'total')
+             .order_by()
+         )],
+        batch_size=BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipt', '0020_ingredient_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_shopping_cart,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 4.2 on 2026-10-18 17:25
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_INDEX = 'receipt_receipt_search_vector'
+SEARCH_FUNCTION = 'receipt_receipt_search_vector_update'
+SEARCH_TRIGGER = 'receipt_receipt_search_vector_trigger'
+FTS_TABLE = 'receipt_receipt_fts'
+
+
+def create_search(apps, schema_editor):
+    """
+    Поддержка полнотекстового поиска рецептов.
+
+    На PostgreSQL колонку search_vector заполняет триггер при каждой
+    вставке и изменении рецепта, поиск идёт по GIN-индексу. На SQLite
+    вместо колонки используется FTS5-таблица, которую синхронизируют
+    триггеры. Существующие рецепты индексируются сразу.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f"""
+            CREATE OR REPLACE FUNCTION {SEARCH_FUNCTION}() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector :=
+                    setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') ||
+                    setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'B');
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        schema_editor.execute(
+            f'CREATE TRIGGER {SEARCH_TRIGGER} '
+            'BEFORE INSERT OR UPDATE OF name, text ON receipt_receipt '
+            f'FOR EACH ROW EXECUTE FUNCTION {SEARCH_FUNCTION}()'
+        )
+        schema_editor.execute('UPDATE receipt_receipt SET name = name')
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} '
+            'ON receipt_receipt USING gin (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            "name, text, content='receipt_receipt', content_rowid='id', "
+            "tokenize='unicode61')"
+        )
+        schema_editor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+            AFTER INSERT ON receipt_receipt BEGIN
+                INSERT INTO {FTS_TABLE} (rowid, name, text)
+                VALUES (new.id, new.name, new.text);
+            END
+        """)
+        schema_editor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+            AFTER DELETE ON receipt_receipt BEGIN
+                INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, text)
+                VALUES ('delete', old.id, old.name, old.text);
+            END
+        """)
+        schema_editor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+            AFTER UPDATE OF name, text ON receipt_receipt BEGIN
+                INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, text)
+                VALUES ('delete', old.id, old.name, old.text);
+                INSERT INTO {FTS_TABLE} (rowid, name, text)
+                VALUES (new.id, new.name, new.text);
+            END
+        """)
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_search(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {SEARCH_INDEX}')
+        schema_editor.execute(
+            f'DROP TRIGGER IF EXISTS {SEARCH_TRIGGER} ON receipt_receipt')
+        schema_editor.execute(f'DROP FUNCTION IF EXISTS {SEARCH_FUNCTION}()')
+    elif vendor == 'sqlite':
+        for action in ('insert', 'delete', 'update'):
+            schema_editor.execute(
+                f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{action}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipt', '0022_user_lookup_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search, drop_search),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-18 17:40
+
+from django.db import migrations, models
+import django.utils.timezone
+import receipt.storage
+
+
+def count_image_references(apps, schema_editor):
+    """Заводит записи о файлах, на которые уже ссылаются рецепты."""
+    Receipt = apps.get_model('receipt', 'Receipt')
+    ImageBlob = apps.get_model('receipt', 'ImageBlob')
+    ImageBlob.objects.bulk_create(
+        [ImageBlob(name=image, refcount=count)
+         for image, count in Receipt.objects.exclude(image='')
+         .values('image').annotate(count=models.Count('id'))
+         .values_list('image', 'count').order_by()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipt', '0024_receipt_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Файл')),
+                ('refcount', models.IntegerField(default=0, verbose_name='Число ссылок')),
+                ('updated', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Изменён')),
+            ],
+            options={
+                'verbose_name': 'Файл картинки',
+                'verbose_name_plural': 'Файлы картинок',
+            },
+        ),
+        migrations.AlterField(
+            model_name='receipt',
+            name='image',
+            field=models.ImageField(help_text='Загрузите картинку ', storage=receipt.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Изображение'),
+        ),
+        migrations.RunPython(count_image_references,
+                             migrations.RunPython.noop),
+    ]
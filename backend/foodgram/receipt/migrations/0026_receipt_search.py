@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 17:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+import receipt.search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipt', '0025_image_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptSearch',
+            fields=[
+                ('recipe', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_row', serialize=False, to='receipt.receipt')),
+                ('name', models.TextField()),
+                ('text', models.TextField()),
+                ('document', receipt.search.FullTextField(db_column='receipt_receipt_fts')),
+            ],
+            options={
+                'db_table': 'receipt_receipt_fts',
+                'managed': False,
+            },
+        ),
+    ]
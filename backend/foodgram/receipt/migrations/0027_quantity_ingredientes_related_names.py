@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-18 18:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipt', '0026_receipt_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='quantity_ingredientes',
+            name='ingredient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredients', to='receipt.ingredient', verbose_name='Ингредиент'),
+        ),
+        migrations.AlterField(
+            model_name='quantity_ingredientes',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipes', to='receipt.receipt', verbose_name='Рецепт'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations
+
+FTS_TABLE = 'receipt_receipt_fts'
+SQLITE_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+    AFTER INSERT ON receipt_receipt BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+    AFTER DELETE ON receipt_receipt BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF name, text ON receipt_receipt BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO {FTS_TABLE} (rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+)
+
+
+def restore_sqlite_search(apps, schema_editor):
+    """
+    На SQLite миграции 0024 и 0025 пересоздают receipt_receipt и
+    теряют триггеры FTS5-таблицы из 0023. Триггеры создаются заново,
+    индекс строится с нуля. Миграция, которая снова пересоздаёт
+    таблицу рецептов на SQLite, должна повторить эту операцию.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+        "name, text, content='receipt_receipt', content_rowid='id', "
+        "tokenize='unicode61')"
+    )
+    for trigger in SQLITE_TRIGGERS:
+        schema_editor.execute(trigger)
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipt', '0027_quantity_ingredientes_related_names'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_sqlite_search,
+                             migrations.RunPython.noop),
+    ]
@@ -1,6 +1,12 @@
-from users.models import User
-from django.db import models
+from users.models import Subscriptions, User
+from django.db import IntegrityError, connections, models, transaction
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, RegexValidator
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .search import FTS_TABLE, FullTextField
+from .storage import recipe_images
 
 
 class Ingredient(models.Model):
@@ -17,6 +23,12 @@ class Ingredient(models.Model):
         ordering = ['name']
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient'
+            )
+        ]
 
     def __str__(self):
         return f'{self.name}'
@@ -58,6 +70,50 @@ class Tag(models.Model):
         return f'{self.name}'
 
 
+class ReceiptQuerySet(models.QuerySet):
+
+    def with_related(self):
+        """Подгружает автора, теги и ингредиенты рецептов пакетно."""
+        return self.select_related('author').prefetch_related(
+            models.Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            models.Prefetch(
+                'recipes',
+                queryset=Quantity_ingredientes.objects.select_related(
+                    'ingredient').order_by('id')
+            ),
+        )
+
+    def latest_per_author(self, limit):
+        """Оставляет не более limit последних рецептов каждого автора."""
+        return self.annotate(
+            author_row=models.Window(
+                expression=RowNumber(),
+                partition_by=models.F('author'),
+                order_by=(models.F('pub_date').desc(), models.F('id').desc()),
+            )
+        ).filter(author_row__lte=limit)
+
+    def with_user_flags(self, user):
+        """
+        Отмечает рецепты из избранного и списка покупок пользователя
+        и рецепты авторов, на которых он подписан.
+        """
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(False),
+                is_in_shopping_cart=models.Value(False),
+                author_is_subscribed=models.Value(False),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef('pk'))),
+            is_in_shopping_cart=models.Exists(For_shop.objects.filter(
+                user=user, recipe=models.OuterRef('pk'))),
+            author_is_subscribed=models.Exists(Subscriptions.objects.filter(
+                user=user, author=models.OuterRef('author'))),
+        )
+
+
 class Receipt(models.Model):
     author = models.ForeignKey(
         User,
@@ -77,6 +133,7 @@ class Receipt(models.Model):
         verbose_name='Изображение',
         help_text='Загрузите картинку ',
         upload_to='posts/',
+        storage=recipe_images,
         blank=False,
         null=False
     )
@@ -112,6 +169,18 @@ class Receipt(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True,
         )
+    image_variants = models.JSONField(
+        verbose_name='Варианты изображения',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+    )
+
+    objects = ReceiptQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
@@ -122,6 +191,28 @@ class Receipt(models.Model):
         return f'{self.name} {self.author}'
 
 
+class ReceiptSearch(models.Model):
+    """
+    Строка FTS5-таблицы поиска рецептов. Таблица есть только на SQLite,
+    её создают миграции receipt.0023 и receipt.0028, а обновляют
+    триггеры на receipt_receipt.
+    """
+    recipe = models.OneToOneField(
+        Receipt,
+        primary_key=True,
+        db_column='rowid',
+        on_delete=models.DO_NOTHING,
+        related_name='search_row',
+    )
+    name = models.TextField()
+    text = models.TextField()
+    document = FullTextField(db_column=FTS_TABLE)
+
+    class Meta:
+        managed = False
+        db_table = FTS_TABLE
+
+
 class Quantity_ingredientes(models.Model):
     recipe = models.ForeignKey(
         Receipt,
@@ -157,12 +248,45 @@ class Quantity_ingredientes(models.Model):
                 f'{self.ingredient.measurement_unit}')
 
 
+class UserRecipeQuerySet(models.QuerySet):
+    """Пары пользователь - рецепт: избранное и список покупок."""
+
+    def add(self, user, recipe):
+        """
+        Добавляет пару одним INSERT ... ON CONFLICT DO NOTHING.
+        Возвращает False, если пара уже была. Внешние ключи проверяются
+        при фиксации: если рецепт удалили параллельно, IntegrityError
+        поднимется на коммите.
+        """
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        opts = self.model._meta
+        sql = 'INSERT INTO {} ({}, {}) VALUES (%s, %s) ON CONFLICT DO NOTHING'
+        with connection.cursor() as cursor:
+            cursor.execute(sql.format(
+                quote(opts.db_table),
+                quote(opts.get_field('user').column),
+                quote(opts.get_field('recipe').column),
+            ), [user.pk, recipe.pk])
+            return cursor.rowcount > 0
+
+    def remove(self, user, recipe_id):
+        """
+        Удаляет пару одним DELETE: сигналов удаления у этих моделей нет,
+        поэтому Django не выбирает строки заранее. Возвращает False,
+        если пары не было.
+        """
+        deleted, _ = self.filter(user=user, recipe_id=recipe_id).delete()
+        return deleted > 0
+
+
 class Favorite(models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='favorite_user',
         verbose_name='Любимый автор',
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Receipt,
@@ -171,6 +295,8 @@ class Favorite(models.Model):
         related_name='favorite_recipe',
     )
 
+    objects = UserRecipeQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
@@ -190,6 +316,7 @@ class For_shop(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='shopping_user',
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Receipt,
@@ -198,9 +325,217 @@ class For_shop(models.Model):
         related_name='shopping_recipe',
     )
 
+    objects = UserRecipeQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_shopping_cart'
+            )
+        ]
 
     def __str__(self):
         return f'{self.user.username} - {self.recipe.name}'
+
+
+class ShoppingCartLineQuerySet(models.QuerySet):
+    """
+    Единственное место, где меняются итоги списков покупок.
+
+    Сигналов здесь нет: каждый путь записи в For_shop или в состав
+    рецепта в корзине сам вызывает нужный метод в той же транзакции.
+    API пользуется точечными методами, админка - rebuild(users).
+    Расхождения находит rebuild_shopping_cart --verify.
+    """
+
+    def apply_deltas(self, user_ids, deltas):
+        """
+        Прибавляет к строкам списков покупок пользователей user_ids
+        количества из словаря {ingredient_id: изменение}.
+        Строки с нулевым количеством удаляются.
+        """
+        deltas = {key: value for key, value in deltas.items() if value}
+        user_ids = list(user_ids)
+        if not deltas or not user_ids:
+            return
+        try:
+            with transaction.atomic():
+                self._apply_deltas(user_ids, deltas)
+        except IntegrityError:
+            # Ту же строку параллельно вставил другой запрос. Теперь она
+            # есть в базе, и повтор заблокирует её и прибавит количество.
+            with transaction.atomic():
+                self._apply_deltas(user_ids, deltas)
+
+    def _apply_deltas(self, user_ids, deltas):
+        lines = {
+            (line.user_id, line.ingredient_id): line
+            for line in self.select_for_update().filter(
+                user_id__in=user_ids, ingredient_id__in=deltas)
+        }
+        to_create, to_update, to_delete = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, delta in deltas.items():
+                line = lines.get((user_id, ingredient_id))
+                if line is None:
+                    if delta > 0:
+                        to_create.append(self.model(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            total_amount=delta))
+                    continue
+                line.total_amount += delta
+                if line.total_amount > 0:
+                    to_update.append(line)
+                else:
+                    to_delete.append(line.pk)
+        self.bulk_create(to_create)
+        self.bulk_update(to_update, ['total_amount'])
+        if to_delete:
+            self.filter(pk__in=to_delete).delete()
+
+    @staticmethod
+    def recipe_amounts(recipes, sign=1):
+        """Суммы ингредиентов рецептов: {ingredient_id: количество}."""
+        return {
+            ingredient_id: sign * total
+            for ingredient_id, total in Quantity_ingredientes.objects
+            .filter(recipe__in=recipes).values('ingredient_id')
+            .annotate(total=models.Sum('amount'))
+            .values_list('ingredient_id', 'total').order_by()
+        }
+
+    def add_recipes(self, user, recipes, sign=1):
+        self.apply_deltas([user.pk], self.recipe_amounts(recipes, sign))
+
+    def remove_recipes(self, user, recipes):
+        self.add_recipes(user, recipes, sign=-1)
+
+    def add_recipe(self, user, recipe):
+        self.add_recipes(user, [recipe])
+
+    def remove_recipe(self, user, recipe):
+        self.remove_recipes(user, [recipe])
+
+    def change_recipe(self, recipe, deltas):
+        """Переносит изменение состава рецепта в списки покупок."""
+        self.apply_deltas(
+            For_shop.objects.filter(recipe=recipe).values_list(
+                'user_id', flat=True),
+            deltas)
+
+    def forget_recipe(self, recipe):
+        """Убирает рецепт из всех списков покупок перед его удалением."""
+        self.change_recipe(recipe, self.recipe_amounts([recipe], sign=-1))
+
+    @staticmethod
+    def live_totals(users=None):
+        """Суммы ингредиентов по корзинам, посчитанные по исходным таблицам."""
+        # Одним filter(): два вызова дали бы два JOIN корзин и двойные суммы.
+        carts = ({'recipe__shopping_recipe__isnull': False} if users is None
+                 else {'recipe__shopping_recipe__user__in': users})
+        rows = Quantity_ingredientes.objects.filter(**carts)
+        return {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total in (
+                rows
+                .values('recipe__shopping_recipe__user', 'ingredient')
+                .annotate(total=models.Sum('amount'))
+                .values_list('recipe__shopping_recipe__user',
+                             'ingredient', 'total')
+                .order_by()
+                .iterator()
+            )
+        }
+
+    def rebuild(self, users=None):
+        """Пересобирает списки покупок всех пользователей или users."""
+        with transaction.atomic():
+            lines = self.all() if users is None else self.filter(
+                user__in=users)
+            lines.delete()
+            self.bulk_create(
+                (self.model(user_id=user_id, ingredient_id=ingredient_id,
+                            total_amount=total)
+                 for (user_id, ingredient_id), total
+                 in self.live_totals(users).items()),
+                batch_size=1000
+            )
+
+
+class ShoppingCartLine(models.Model):
+    """Итоговое количество ингредиента в списке покупок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_lines',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_lines',
+        verbose_name='Ингредиент',
+    )
+    total_amount = models.PositiveIntegerField('Количество')
+
+    objects = ShoppingCartLineQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Строки списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_cart_line'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} - {self.ingredient.name}'
+
+
+class ImageBlobQuerySet(models.QuerySet):
+
+    def acquire(self, name):
+        """Добавляет ссылку на файл, заводя запись при первой."""
+        if self.filter(name=name).update(
+                refcount=models.F('refcount') + 1, updated=timezone.now()):
+            return
+        _, created = self.get_or_create(name=name, defaults={'refcount': 1})
+        if not created:
+            self.acquire(name)
+
+    def release(self, name):
+        self.filter(name=name).update(
+            refcount=models.F('refcount') - 1, updated=timezone.now())
+
+    def recount(self, names):
+        """Пересчитывает ссылки на файлы names по рецептам."""
+        counts = dict(
+            Receipt.objects.filter(image__in=names).values('image')
+            .annotate(count=models.Count('id')).values_list('image', 'count')
+        )
+        for name in names:
+            self.update_or_create(name=name, defaults={
+                'refcount': counts.get(name, 0),
+                'updated': timezone.now(),
+            })
+
+
+class ImageBlob(models.Model):
+    """Файл картинки и число рецептов, которые на него ссылаются."""
+    name = models.CharField('Файл', max_length=100, unique=True)
+    refcount = models.IntegerField('Число ссылок', default=0)
+    updated = models.DateTimeField('Изменён', default=timezone.now)
+
+    objects = ImageBlobQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount})'
@@ -0,0 +1,70 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, FloatField, Lookup, TextField
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'receipt_receipt_fts'
+WORD = re.compile(r'\w+')
+
+
+def postgresql_search(queryset, text):
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+    return (queryset.filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F('search_vector'), query))
+            .order_by('-search_rank', '-pub_date', '-id'))
+
+
+class Match(Lookup):
+    """Полнотекстовое условие FTS5: <колонка> MATCH <запрос>."""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class FullTextField(TextField):
+    """
+    Скрытая колонка FTS5-таблицы с её же именем: условие MATCH по ней
+    ищет сразу по всем колонкам таблицы.
+    """
+
+
+FullTextField.register_lookup(Match)
+
+
+def sqlite_search(queryset, text):
+    words = WORD.findall(text)
+    if not words:
+        return queryset.none()
+    match = ' '.join(f'"{word}"*' for word in words)
+    return (
+        queryset
+        .filter(search_row__document__match=match)
+        .annotate(search_rank=RawSQL(
+            f'bm25({FTS_TABLE}, 10.0, 1.0)', [], output_field=FloatField()))
+        .order_by('search_rank', '-pub_date', '-id')
+    )
+
+
+def search_recipes(queryset, text):
+    """
+    Полнотекстовый поиск рецептов по названию и описанию,
+    самые релевантные - первыми.
+
+    На PostgreSQL поиск идёт по колонке search_vector с GIN-индексом
+    (конфигурация russian, название весит больше описания), на SQLite -
+    по FTS5-таблице receipt_receipt_fts. Обе поддерживаются триггерами
+    из миграции receipt.0023, на SQLite после пересоздания таблицы
+    рецептов их восстанавливает миграция receipt.0028.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        return postgresql_search(queryset, text)
+    if vendor == 'sqlite':
+        return sqlite_search(queryset, text)
+    return queryset.filter(name__icontains=text)
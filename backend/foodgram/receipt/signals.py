@@ -0,0 +1,41 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import ImageBlob, Ingredient, Receipt, Tag
+from .versions import INGREDIENTS, TAGS, bump_version
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(**kwargs):
+    transaction.on_commit(partial(bump_version, INGREDIENTS))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tags_changed(**kwargs):
+    transaction.on_commit(partial(bump_version, TAGS))
+
+
+@receiver(pre_save, sender=Receipt)
+def remember_stored_image(instance, **kwargs):
+    instance._stored_image = instance.pk and Receipt.objects.filter(
+        pk=instance.pk).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=Receipt)
+def recipe_image_saved(instance, **kwargs):
+    stored = getattr(instance, '_stored_image', None)
+    if instance.image.name == stored:
+        return
+    if instance.image.name:
+        ImageBlob.objects.acquire(instance.image.name)
+    if stored:
+        ImageBlob.objects.release(stored)
+
+
+@receiver(post_delete, sender=Receipt)
+def recipe_image_deleted(instance, **kwargs):
+    if instance.image.name:
+        ImageBlob.objects.release(instance.image.name)
@@ -0,0 +1,51 @@
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def is_content_name(name):
+    """Назван ли файл по хешу содержимого."""
+    return bool(CONTENT_NAME.search(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файлы называются по SHA-256 содержимого: posts/ab/ab12….jpg.
+    Одинаковая картинка хранится один раз, повторная загрузка ничего
+    не пишет на диск, а файл по ссылке никогда не меняется.
+    Удаляет файлы только команда collect_image_garbage.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        if is_content_name(name) and self.exists(name):
+            # Тот же файл успел записать параллельный запрос.
+            raise FileExistsError(name)
+        return name
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory, filename = posixpath.split(name)
+        name = posixpath.join(directory, digest[:2], digest + os.path.splitext(
+            filename)[1].lower())
+        if not self.exists(name):
+            try:
+                return super()._save(name, content)
+            except FileExistsError:
+                if not self.exists(name):
+                    raise
+        # Свежая дата изменения не даёт сборщику мусора удалить файл,
+        # на который вот-вот сошлётся новый рецепт.
+        os.utime(self.path(name))
+        return name
+
+
+recipe_images = ContentAddressedStorage()
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+INGREDIENTS = 'ingredients'
+TAGS = 'tags'
+
+
+def version_key(name):
+    return f'{name}:version'
+
+
+def new_version():
+    """
+    Начальная версия. После очистки кеша счётчик начинается
+    с нового значения, а не с нуля, иначе старые ETag и кеши
+    воркеров снова совпали бы с версией уже других данных.
+    """
+    return time.time_ns()
+
+
+def bump_version(name):
+    """Помечает справочник изменённым во всех воркерах."""
+    try:
+        cache.incr(version_key(name))
+    except ValueError:
+        cache.set(version_key(name), new_version(), None)
+
+
+def get_version(name):
+    return cache.get_or_set(version_key(name), new_version, None)
+
+
+def is_shared_cache():
+    """
+    Версии и кеши рецептов живут в кеше по умолчанию. LocMemCache у
+    каждого процесса свой: изменение в одном воркере другие не увидят.
+    """
+    return not settings.CACHES['default']['BACKEND'].endswith(
+        '.LocMemCache')
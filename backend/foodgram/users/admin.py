@@ -1,9 +1,13 @@
 from django.contrib import admin
-from .models import User, Subscriptions
+
+from receipt.admin import ShoppingCartAdminMixin
+from receipt.models import For_shop
+
+from .models import Subscriptions, User
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(ShoppingCartAdminMixin, admin.ModelAdmin):
     list_display = (
         'username', 'email', 'password', 'first_name', 'last_name',
     )
@@ -12,6 +16,11 @@ class UserAdmin(admin.ModelAdmin):
     search_fields = ('username', 'email')
     empty_value_display = '-пусто-'
 
+    def cart_users(self, queryset):
+        # Вместе с пользователем удаляются его рецепты в чужих корзинах.
+        return For_shop.objects.filter(
+            recipe__author__in=queryset).values_list('user_id', flat=True)
+
 
 @admin.register(Subscriptions)
 class SubscribeAdmin(admin.ModelAdmin):
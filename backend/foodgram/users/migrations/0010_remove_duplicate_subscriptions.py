@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def remove_duplicate_subscriptions(apps, schema_editor):
+    """Удаляет повторные подписки, оставляя самую раннюю запись."""
+    Subscriptions = apps.get_model('users', 'Subscriptions')
+    duplicates = Subscriptions.objects.filter(models.Exists(
+        Subscriptions.objects.filter(user=models.OuterRef('user'),
+                                     author=models.OuterRef('author'),
+                                     id__lt=models.OuterRef('id'))
+    ))
+    while True:
+        batch = list(duplicates.values_list('id', flat=True)[:BATCH_SIZE])
+        if not batch:
+            break
+        Subscriptions.objects.filter(id__in=batch).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_alter_subscriptions_author_alter_subscriptions_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_subscriptions,
+                             migrations.RunPython.noop),
+    ]
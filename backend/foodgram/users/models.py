@@ -68,9 +68,16 @@ class Subscriptions(models.Model):
         User,
         on_delete=models.CASCADE,
         blank=True, null=True,
-        related_name='subscriber'
+        related_name='subscriber',
+        db_index=False,
     )
 
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_subscription'
+            ),
+        )